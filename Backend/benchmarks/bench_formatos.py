@@ -0,0 +1,96 @@
+"""
+Benchmark de formatos de respuesta: JSON vs MessagePack (con y sin formato tabular)
+y el efecto de la compresión gzip.
+
+Compara el tamaño en bytes y el tiempo de codificación/decodificación de las dos
+cargas más grandes de la API:
+  * Una página de `RutinaPaginatedRead` con 100 rutinas.
+  * Un `RutinaRead` con cientos de ejercicios.
+
+Uso (desde la carpeta Backend):
+    python -m benchmarks.bench_formatos [--ejercicios 500] [--repeticiones 200]
+"""
+import argparse
+import gzip
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from timeit import timeit
+
+# Permite ejecutar el script directamente además de como módulo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from formatos import aplicar_layout_tabla, codificar_msgpack, decodificar_msgpack  # noqa: E402
+from models import DiaSemana  # noqa: E402
+
+# --- Datos Sintéticos ---
+
+def _rutina(indice: int) -> dict:
+    return {
+        "nombre": f"Rutina de fuerza {indice}",
+        "descripcion": "Rutina sintética para el benchmark de formatos." if indice % 2 else None,
+        "id": indice,
+        "fecha_creacion": (datetime(2025, 1, 1) + timedelta(minutes=indice)).isoformat(),
+    }
+
+def _ejercicio(indice: int, rutina_id: int) -> dict:
+    dias = list(DiaSemana)
+    return {
+        "nombre": f"Ejercicio {indice % 40}",
+        "dia_semana": dias[indice % len(dias)].value,
+        "series": 3 + indice % 3,
+        "repeticiones": 8 + indice % 5,
+        "orden": indice // len(dias) + 1,
+        "peso": None if indice % 6 == 0 else 20.0 + indice % 50,
+        "notas": "Controlar la bajada." if indice % 4 == 0 else None,
+        "rutina_id": rutina_id,
+        "id": indice + 1,
+    }
+
+def pagina_rutinas(tamano: int = 100) -> dict:
+    return {
+        "items": [_rutina(i) for i in range(1, tamano + 1)],
+        "total_items": 10_000,
+        "pagina": 1,
+        "tamano_pagina": tamano,
+        "total_paginas": 10_000 // tamano,
+    }
+
+def detalle_rutina(cantidad_ejercicios: int) -> dict:
+    return {**_rutina(1), "ejercicios": [_ejercicio(i, 1) for i in range(cantidad_ejercicios)]}
+
+# --- Codificadores ---
+
+def _json(datos) -> bytes:
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+FORMATOS = {
+    "json": (_json, json.loads, False),
+    "json-tabla": (_json, json.loads, True),
+    "msgpack": (codificar_msgpack, decodificar_msgpack, False),
+    "msgpack-tabla": (codificar_msgpack, decodificar_msgpack, True),
+}
+
+def medir(nombre_carga: str, datos: dict, repeticiones: int) -> None:
+    print(f"\n{nombre_carga}")
+    print(f"{'formato':<15}{'bytes':>10}{'gzip':>10}{'codificar (µs)':>17}{'decodificar (µs)':>19}")
+    for nombre, (codificar, decodificar, tabla) in FORMATOS.items():
+        carga = aplicar_layout_tabla(datos) if tabla else datos
+        contenido = codificar(carga)
+        comprimido = gzip.compress(contenido)
+        t_codificar = timeit(lambda: codificar(carga), number=repeticiones) / repeticiones * 1e6
+        t_decodificar = timeit(lambda: decodificar(contenido), number=repeticiones) / repeticiones * 1e6
+        print(f"{nombre:<15}{len(contenido):>10}{len(comprimido):>10}{t_codificar:>17.1f}{t_decodificar:>19.1f}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ejercicios", type=int, default=500, help="Ejercicios en el detalle de rutina.")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Repeticiones por medición.")
+    args = parser.parse_args()
+
+    medir("RutinaPaginatedRead (100 rutinas)", pagina_rutinas(100), args.repeticiones)
+    medir(f"RutinaRead ({args.ejercicios} ejercicios)", detalle_rutina(args.ejercicios), args.repeticiones)
+
+if __name__ == "__main__":
+    main()
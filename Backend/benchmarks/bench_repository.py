@@ -0,0 +1,256 @@
+"""
+Microbenchmarks de escalabilidad de la capa de repositorio (sin HTTP).
+
+Para cada tamaño de dataset (por defecto 1k, 100k y 1M rutinas) se recrean las
+tablas, se cargan rutinas sintéticas con una distribución realista de ejercicios
+por día de la semana y se mide, llamando directamente a `repository.py`:
+
+  * get_rutinas_paginated: primera página y última página, con y sin filtro por día
+    (la primera página se mide también con el total ya cacheado).
+  * search_rutinas_by_name
+  * duplicate_rutina
+  * add_multiple_ejercicios_to_rutina
+  * delete_rutina_by_id
+
+Por cada llamada se registra el tiempo (mediana de las repeticiones) y la cantidad
+de consultas SQL ejecutadas. Los resultados se imprimen, se guardan en CSV y,
+opcionalmente, se grafican (tiempo vs tamaño, escala log-log) con matplotlib.
+
+Uso (desde la carpeta Backend):
+    python -m benchmarks.bench_repository --tamanos 1000,100000
+    python -m benchmarks.bench_repository --database-url postgresql+psycopg2://... --grafico escalado.png
+
+ATENCIÓN: se eliminan y recrean las tablas de la base indicada. El dataset de 1M
+rutinas tiene unos 16M de ejercicios y tarda bastante en cargarse.
+"""
+import argparse
+import csv
+import random
+import statistics
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List
+
+# Permite ejecutar el script directamente además de como módulo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event, insert, text  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+import repository  # noqa: E402
+from models import DiaSemana, Ejercicio, EjercicioBase, Rutina  # noqa: E402
+
+TAMANOS_POR_DEFECTO = "1000,100000,1000000"
+TAMANO_LOTE = 10_000
+TAMANO_PAGINA = 10
+
+# Probabilidad de entrenar cada día: la mayoría de las rutinas usan Lunes/Miércoles/Viernes
+PESOS_DIAS = {
+    DiaSemana.LUNES: 0.85,
+    DiaSemana.MARTES: 0.45,
+    DiaSemana.MIERCOLES: 0.75,
+    DiaSemana.JUEVES: 0.45,
+    DiaSemana.VIERNES: 0.70,
+    DiaSemana.SABADO: 0.25,
+    DiaSemana.DOMINGO: 0.05,
+}
+NOMBRES_EJERCICIOS = [
+    "Sentadilla", "Press de banca", "Peso muerto", "Dominadas", "Remo con barra",
+    "Press militar", "Zancadas", "Curl de bíceps", "Fondos", "Hip thrust",
+    "Plancha", "Prensa", "Extensión de tríceps", "Elevaciones laterales", "Remo en polea",
+]
+
+# --- Carga de Datos Sintéticos ---
+
+def _dias_de_rutina(rng: random.Random) -> List[DiaSemana]:
+    dias = [dia for dia, peso in PESOS_DIAS.items() if rng.random() < peso]
+    return dias or [DiaSemana.LUNES]
+
+def cargar_dataset(engine, cantidad_rutinas: int, semilla: int = 42) -> int:
+    """Recrea las tablas y carga `cantidad_rutinas` rutinas con sus ejercicios. Devuelve los ejercicios creados."""
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+
+    rng = random.Random(semilla)
+    inicio = datetime(2025, 1, 1)
+    total_ejercicios = 0
+    with engine.begin() as conexion:
+        for desde in range(1, cantidad_rutinas + 1, TAMANO_LOTE):
+            hasta = min(desde + TAMANO_LOTE, cantidad_rutinas + 1)
+            rutinas, ejercicios = [], []
+            for rutina_id in range(desde, hasta):
+                rutinas.append({
+                    "id": rutina_id,
+                    "nombre": f"Rutina {rutina_id}",
+                    "descripcion": None,
+                    "fecha_creacion": inicio + timedelta(seconds=rutina_id),
+                })
+                for dia in _dias_de_rutina(rng):
+                    for orden in range(1, rng.randint(3, 6) + 1):
+                        ejercicios.append({
+                            "nombre": rng.choice(NOMBRES_EJERCICIOS),
+                            "dia_semana": dia,
+                            "series": rng.randint(3, 5),
+                            "repeticiones": rng.choice((5, 8, 10, 12, 15)),
+                            "orden": orden,
+                            "peso": None if rng.random() < 0.15 else float(rng.randrange(10, 160, 5)),
+                            "notas": None,
+                            "rutina_id": rutina_id,
+                        })
+            conexion.execute(insert(Rutina), rutinas)
+            conexion.execute(insert(Ejercicio), ejercicios)
+            total_ejercicios += len(ejercicios)
+        if engine.dialect.name == "postgresql":
+            # Los ids de las rutinas se insertaron explícitamente: la secuencia SERIAL
+            # debe continuar tras el máximo o duplicate_rutina chocaría con la clave primaria
+            conexion.execute(text(
+                "SELECT setval(pg_get_serial_sequence('rutina', 'id'), (SELECT MAX(id) FROM rutina))"
+            ))
+    return total_ejercicios
+
+# --- Medición ---
+
+class ContadorConsultas:
+    """Cuenta las sentencias SQL que ejecuta un engine."""
+
+    def __init__(self, engine):
+        self.total = 0
+        event.listen(engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, *args, **kwargs) -> None:
+        self.total += 1
+
+def medir(
+    engine, contador: ContadorConsultas, funcion: Callable[[Session], object],
+    repeticiones: int, limpiar_cache: bool = True
+) -> Dict[str, float]:
+    """Ejecuta `funcion` con una sesión nueva en cada repetición y devuelve la mediana de tiempo y consultas."""
+    tiempos, consultas = [], []
+    for _ in range(repeticiones):
+        if limpiar_cache:
+            repository.invalidar_conteos()
+            repository.invalidar_estadisticas()
+        with Session(engine) as session:
+            antes = contador.total
+            inicio = perf_counter()
+            funcion(session)
+            tiempos.append((perf_counter() - inicio) * 1000)
+            consultas.append(contador.total - antes)
+    return {"ms": statistics.median(tiempos), "consultas": statistics.median(consultas)}
+
+def _duplicar_y_borrar(rutina_id: int, registro: Dict[str, Dict[str, float]], engine, contador, repeticiones: int) -> None:
+    """Mide duplicate_rutina y delete_rutina_by_id sobre la copia, dejando el dataset como estaba."""
+    copias: List[int] = []
+    registro["duplicate_rutina"] = medir(
+        engine, contador, lambda s: copias.append(repository.duplicate_rutina(s, rutina_id).id), repeticiones
+    )
+    registro["delete_rutina_by_id"] = medir(
+        engine, contador, lambda s: repository.delete_rutina_by_id(s, copias.pop()), repeticiones
+    )
+
+def ejecutar_casos(engine, contador: ContadorConsultas, cantidad_rutinas: int, repeticiones: int) -> Dict[str, Dict[str, float]]:
+    ultima_pagina = max(1, (cantidad_rutinas + TAMANO_PAGINA - 1) // TAMANO_PAGINA)
+    rutina_media = max(1, cantidad_rutinas // 2)
+    ejercicios_nuevos = [
+        EjercicioBase(nombre=nombre, dia_semana=DiaSemana.MARTES, series=3, repeticiones=10)
+        for nombre in NOMBRES_EJERCICIOS[:10]
+    ]
+
+    registro: Dict[str, Dict[str, float]] = {}
+    for etiqueta, pagina, dia in (
+        ("paginado_primera", 1, None),
+        ("paginado_ultima", ultima_pagina, None),
+        ("paginado_primera_lunes", 1, DiaSemana.LUNES),
+        ("paginado_ultima_lunes", ultima_pagina, DiaSemana.LUNES),
+    ):
+        registro[etiqueta] = medir(
+            engine, contador,
+            lambda s, p=pagina, d=dia: repository.get_rutinas_paginated(s, p, TAMANO_PAGINA, d),
+            repeticiones,
+        )
+    # Segunda navegación de la misma página con el total ya cacheado
+    with Session(engine) as session:
+        repository.get_rutinas_paginated(session, 1, TAMANO_PAGINA) # Calentamiento de la caché
+    registro["paginado_primera_conteo_cacheado"] = medir(
+        engine, contador, lambda s: repository.get_rutinas_paginated(s, 1, TAMANO_PAGINA), repeticiones,
+        limpiar_cache=False,
+    )
+    registro["search_rutinas_by_name"] = medir(
+        engine, contador, lambda s: repository.search_rutinas_by_name(s, f"rutina {rutina_media}"), repeticiones
+    )
+    registro["add_multiple_ejercicios_to_rutina"] = medir(
+        engine, contador,
+        lambda s: repository.add_multiple_ejercicios_to_rutina(s, rutina_media, ejercicios_nuevos),
+        repeticiones,
+    )
+    _duplicar_y_borrar(rutina_media, registro, engine, contador, repeticiones)
+    return registro
+
+# --- Reporte ---
+
+def guardar_csv(resultados: List[dict], ruta: Path) -> None:
+    with ruta.open("w", newline="", encoding="utf-8") as archivo:
+        escritor = csv.DictWriter(archivo, fieldnames=["rutinas", "caso", "ms", "consultas"])
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+def graficar(resultados: List[dict], ruta: Path) -> None:
+    """Grafica el tiempo de cada caso en función del tamaño del dataset (requiere matplotlib)."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib no está instalado: se omite el gráfico (pip install matplotlib).")
+        return
+
+    figura, eje = plt.subplots(figsize=(10, 6))
+    for caso in dict.fromkeys(fila["caso"] for fila in resultados):
+        filas = [fila for fila in resultados if fila["caso"] == caso]
+        eje.plot([f["rutinas"] for f in filas], [f["ms"] for f in filas], marker="o", label=caso)
+    eje.set_xscale("log")
+    eje.set_yscale("log")
+    eje.set_xlabel("Rutinas en la base de datos")
+    eje.set_ylabel("Tiempo por llamada (ms, mediana)")
+    eje.set_title("Escalado de las funciones de repository.py")
+    eje.grid(True, which="both", alpha=0.3)
+    eje.legend(fontsize="small")
+    figura.tight_layout()
+    figura.savefig(ruta)
+    print(f"Gráfico guardado en {ruta}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", default=TAMANOS_POR_DEFECTO, help="Cantidades de rutinas separadas por comas.")
+    parser.add_argument(
+        "--database-url", default=f"sqlite:///{Path(tempfile.gettempdir()) / 'gym_bench.sqlite3'}",
+        help="Base de datos de pruebas (sus tablas se eliminan). Por defecto, un archivo SQLite temporal.",
+    )
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones por caso (se informa la mediana).")
+    parser.add_argument("--salida", type=Path, default=Path("bench_repository.csv"), help="Archivo CSV de resultados.")
+    parser.add_argument("--grafico", type=Path, default=None, help="Archivo PNG para el gráfico (opcional).")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    contador = ContadorConsultas(engine)
+    resultados: List[dict] = []
+
+    for cantidad in (int(tamano) for tamano in args.tamanos.split(",")):
+        inicio = perf_counter()
+        ejercicios = cargar_dataset(engine, cantidad)
+        print(f"\n{cantidad} rutinas / {ejercicios} ejercicios (carga: {perf_counter() - inicio:.1f} s)")
+        print(f"{'caso':<38}{'ms':>12}{'consultas':>11}")
+        for caso, medicion in ejecutar_casos(engine, contador, cantidad, args.repeticiones).items():
+            print(f"{caso:<38}{medicion['ms']:>12.2f}{medicion['consultas']:>11.0f}")
+            resultados.append({"rutinas": cantidad, "caso": caso, **medicion})
+
+    guardar_csv(resultados, args.salida)
+    print(f"\nResultados guardados en {args.salida}")
+    if args.grafico:
+        graficar(resultados, args.grafico)
+
+if __name__ == "__main__":
+    main()
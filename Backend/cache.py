@@ -0,0 +1,67 @@
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# --- Caché en Memoria con Expiración (TTL) ---
+
+class TTLCache:
+    """
+    Caché en memoria, segura entre hilos, con expiración por entrada.
+    Los endpoints síncronos de FastAPI corren en un threadpool, por eso
+    todas las operaciones se protegen con un Lock.
+
+    Cada invalidación incrementa una generación: quien calcula un valor puede
+    leerla antes de consultar la base de datos y pasarla a `set`, que descarta
+    el valor si entretanto hubo una invalidación (evita cachear datos previos
+    a una escritura concurrente).
+    """
+
+    def __init__(self, ttl_segundos: float, max_entradas: int = 1024):
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._datos: Dict[Hashable, Tuple[float, Any]] = {}
+        self._generacion = 0
+        self._lock = Lock()
+
+    @property
+    def generacion(self) -> int:
+        """Contador de invalidaciones, a leer antes de calcular un valor."""
+        with self._lock:
+            return self._generacion
+
+    def get(self, clave: Hashable) -> Optional[Any]:
+        """Devuelve el valor almacenado o None si no existe o expiró."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira < monotonic():
+                del self._datos[clave]
+                return None
+            return valor
+
+    def set(self, clave: Hashable, valor: Any, generacion: Optional[int] = None) -> None:
+        """
+        Almacena un valor. Si se supera el máximo, descarta la entrada más antigua.
+        Si se indica `generacion` y hubo una invalidación desde entonces, no se guarda.
+        """
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return
+            if clave not in self._datos and len(self._datos) >= self.max_entradas:
+                # Los dict conservan el orden de inserción: la primera clave es la más antigua
+                self._datos.pop(next(iter(self._datos)))
+            self._datos[clave] = (monotonic() + self.ttl_segundos, valor)
+
+    def invalidate(self, clave: Hashable) -> None:
+        """Elimina una entrada concreta (si existe)."""
+        with self._lock:
+            self._datos.pop(clave, None)
+            self._generacion += 1
+
+    def clear(self) -> None:
+        """Vacía la caché por completo."""
+        with self._lock:
+            self._datos.clear()
+            self._generacion += 1
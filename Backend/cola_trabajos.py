@@ -0,0 +1,194 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from os import getenv, getpid
+from socket import gethostname
+from threading import BoundedSemaphore, Event, Thread
+from typing import Any, Callable, Optional, Set
+
+from sqlmodel import Session, or_, update
+
+from database import engine
+from models import EstadoTrabajo, Trabajo
+
+# --- Configuración del Ejecutor de Trabajos ---
+
+# Hilos que ejecutan trabajos a la vez (cada uno usa una conexión del pool)
+TRABAJOS_MAX_WORKERS = int(getenv("TRABAJOS_MAX_WORKERS", "2"))
+# Trabajos admitidos entre pendientes y en curso; por encima se rechazan
+TRABAJOS_MAX_PENDIENTES = int(getenv("TRABAJOS_MAX_PENDIENTES", "100"))
+
+# Puntos porcentuales mínimos entre dos actualizaciones del progreso guardadas
+PROGRESO_PASO = 10
+# SQLite admite un solo escritor: mientras el trabajo tiene su transacción abierta,
+# otra conexión no puede guardar el progreso (quedaría bloqueada). En ese caso el
+# progreso solo pasa de 0 a 100.
+PROGRESO_INTERMEDIO = engine.dialect.name != "sqlite"
+
+# Función para informar el progreso (0-100) de un trabajo
+InformarProgreso = Callable[[int], None]
+# Una función de trabajo recibe su propia sesión y la función de progreso,
+# y devuelve un resultado serializable a JSON
+FuncionTrabajo = Callable[[Session, InformarProgreso], Any]
+
+class ColaTrabajosLlenaError(Exception):
+    """Excepción lanzada cuando no se admiten más trabajos en la cola."""
+    pass
+
+_executor: Optional[ThreadPoolExecutor] = None
+_cupos = BoundedSemaphore(TRABAJOS_MAX_PENDIENTES)
+# Trabajos encolados por este proceso que todavía no terminaron
+_trabajos_locales: Set[int] = set()
+_parar_latidos = Event()
+_hilo_latidos: Optional[Thread] = None
+
+# --- Latidos y Recuperación de Trabajos Huérfanos ---
+
+# Cada proceso renueva periódicamente el latido de sus trabajos sin terminar. Un
+# trabajo cuyo latido venció pertenece a un proceso que murió (p. ej. un worker
+# terminado con SIGKILL al agotar GRACEFUL_TIMEOUT) y se marca como fallido.
+# Como solo se miran latidos vencidos, cualquier worker puede hacerlo en cualquier
+# momento sin afectar a los trabajos que otros workers siguen ejecutando.
+TRABAJOS_LATIDO_SEGUNDOS = float(getenv("TRABAJOS_LATIDO_SEGUNDOS", "10"))
+TRABAJOS_VENCIMIENTO_SEGUNDOS = float(getenv("TRABAJOS_VENCIMIENTO_SEGUNDOS", "60"))
+
+def _propietario() -> str:
+    """Identifica al proceso actual (se evalúa en cada llamada: el PID cambia tras un fork)."""
+    return f"{gethostname()}:{getpid()}"
+
+def _renovar_latidos() -> None:
+    """Actualiza el latido de los trabajos sin terminar de este proceso."""
+    locales = list(_trabajos_locales)
+    if not locales:
+        return
+    with Session(engine) as session:
+        session.exec(update(Trabajo).where(Trabajo.id.in_(locales)).values(latido=datetime.utcnow()))
+        session.commit()
+
+def recuperar_interrumpidos() -> None:
+    """Marca como fallidos los trabajos sin terminar cuyo latido venció (proceso caído o reiniciado)."""
+    ahora = datetime.utcnow()
+    limite = ahora - timedelta(seconds=TRABAJOS_VENCIMIENTO_SEGUNDOS)
+    condiciones = [
+        Trabajo.estado.in_([EstadoTrabajo.PENDIENTE, EstadoTrabajo.EN_PROCESO]),
+        or_(Trabajo.latido.is_(None), Trabajo.latido < limite),
+    ]
+    locales = list(_trabajos_locales)
+    if locales:
+        # Los de este proceso siguen vivos aunque un latido no se haya podido guardar
+        condiciones.append(Trabajo.id.notin_(locales))
+    with Session(engine) as session:
+        session.exec(
+            update(Trabajo).where(*condiciones).values(
+                estado=EstadoTrabajo.FALLIDO,
+                error="Trabajo interrumpido: el proceso que lo ejecutaba se detuvo.",
+                fecha_actualizacion=ahora,
+            )
+        )
+        session.commit()
+
+def _latir() -> None:
+    """Hilo de latidos: renueva los trabajos propios y recupera los huérfanos."""
+    while not _parar_latidos.wait(TRABAJOS_LATIDO_SEGUNDOS):
+        try:
+            _renovar_latidos()
+            recuperar_interrumpidos()
+        except Exception as e:
+            print(f"Error al renovar los latidos de los trabajos: {e}")
+
+# --- Ciclo de Vida ---
+
+def iniciar_trabajos() -> None:
+    """
+    Crea el pool de hilos y el hilo de latidos. Se llama desde el lifespan (una vez
+    por proceso worker), nunca al importar el módulo, para que los hilos no se
+    pierdan en un fork.
+    """
+    global _executor, _hilo_latidos
+    recuperar_interrumpidos()
+    _executor = ThreadPoolExecutor(max_workers=TRABAJOS_MAX_WORKERS, thread_name_prefix="trabajo")
+    _parar_latidos.clear()
+    _hilo_latidos = Thread(target=_latir, name="trabajo-latidos", daemon=True)
+    _hilo_latidos.start()
+
+def detener_trabajos() -> None:
+    """
+    Deja de admitir trabajos y espera a que terminen los encolados por este proceso,
+    incluidos los que todavía no empezaron (ya se respondió 202 por ellos). Los
+    latidos siguen mientras tanto; si el proceso muere antes de terminar, sus
+    trabajos se recuperan como fallidos cuando el latido vence.
+    """
+    global _executor, _hilo_latidos
+    if _executor is None:
+        return
+    executor, _executor = _executor, None
+    executor.shutdown(wait=True)
+    _parar_latidos.set()
+    if _hilo_latidos is not None:
+        _hilo_latidos.join()
+        _hilo_latidos = None
+
+# --- Ejecución ---
+
+def _actualizar(trabajo_id: int, **campos) -> None:
+    """Persiste el estado de un trabajo en una sesión propia."""
+    with Session(engine) as session:
+        trabajo = session.get(Trabajo, trabajo_id)
+        trabajo.sqlmodel_update(campos)
+        trabajo.fecha_actualizacion = datetime.utcnow()
+        session.add(trabajo)
+        session.commit()
+
+def _informar_progreso(trabajo_id: int) -> InformarProgreso:
+    """Crea la función de progreso de un trabajo, que solo guarda avances de al menos PROGRESO_PASO puntos."""
+    ultimo = 0
+
+    def informar(porcentaje: int) -> None:
+        nonlocal ultimo
+        # El 100 % lo marca _ejecutar al terminar el trabajo
+        porcentaje = min(99, porcentaje)
+        if not PROGRESO_INTERMEDIO or porcentaje < ultimo + PROGRESO_PASO:
+            return
+        ultimo = porcentaje
+        _actualizar(trabajo_id, progreso=porcentaje)
+
+    return informar
+
+def _ejecutar(trabajo_id: int, funcion: FuncionTrabajo) -> None:
+    """Ejecuta el trabajo en un hilo del pool y guarda su resultado o su error."""
+    try:
+        _actualizar(trabajo_id, estado=EstadoTrabajo.EN_PROCESO)
+        with Session(engine) as session:
+            resultado = funcion(session, _informar_progreso(trabajo_id))
+        _actualizar(trabajo_id, estado=EstadoTrabajo.COMPLETADO, progreso=100, resultado=resultado)
+    except Exception as e:
+        print(f"Error en el trabajo {trabajo_id}: {e}")
+        _actualizar(trabajo_id, estado=EstadoTrabajo.FALLIDO, error=str(e))
+    finally:
+        _trabajos_locales.discard(trabajo_id)
+        _cupos.release()
+
+def encolar_trabajo(session: Session, tipo: str, usuario_id: int, funcion: FuncionTrabajo) -> Trabajo:
+    """
+    Registra un trabajo en la base de datos y lo envía al pool de hilos.
+    Lanza ColaTrabajosLlenaError si se alcanzó TRABAJOS_MAX_PENDIENTES.
+    """
+    if _executor is None:
+        raise RuntimeError("El ejecutor de trabajos no está iniciado.")
+    if not _cupos.acquire(blocking=False):
+        raise ColaTrabajosLlenaError("Hay demasiados trabajos en curso. Intenta nuevamente más tarde.")
+
+    try:
+        trabajo = Trabajo(tipo=tipo, usuario_id=usuario_id, propietario=_propietario(), latido=datetime.utcnow())
+        session.add(trabajo)
+        session.commit()
+        session.refresh(trabajo)
+        _trabajos_locales.add(trabajo.id)
+        _executor.submit(_ejecutar, trabajo.id, funcion)
+    except Exception:
+        _cupos.release()
+        raise
+    return trabajo
+
+def get_trabajo_by_id(session: Session, trabajo_id: int) -> Optional[Trabajo]:
+    """Recupera un trabajo por su ID."""
+    return session.get(Trabajo, trabajo_id)
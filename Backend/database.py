@@ -1,7 +1,12 @@
+from itertools import count
 from os import getenv
-from typing import Generator
+from threading import Lock
+from time import monotonic
+from typing import Dict, Generator, List, Optional
 
 from dotenv import load_dotenv
+from fastapi import Depends, Request
+from sqlalchemy import Engine, text
 from sqlmodel import create_engine, SQLModel, Session
 
 # Carga las variables de entorno
@@ -48,25 +53,182 @@ DATABASE_URL = get_db_url()
 # El motor de SQLModel (que usa SQLAlchemy) maneja la conexión con la DB.
 engine = create_engine(DATABASE_URL, echo=True)
 
+# --- Réplicas de Lectura (Opcional) ---
+
+def get_replica_urls() -> List[str]:
+    """
+    Lee las URLs de las réplicas de solo lectura desde DATABASE_REPLICA_URLS
+    (separadas por comas). Si no está definida, todo el tráfico va al primario.
+    """
+    urls = getenv("DATABASE_REPLICA_URLS", "")
+    return [url.strip() for url in urls.split(",") if url.strip()]
+
+# Cada cuánto se vuelve a comprobar la salud de una réplica
+REPLICA_HEALTH_INTERVAL_SEGUNDOS = float(getenv("REPLICA_HEALTH_INTERVAL_SEGUNDOS", "10"))
+# Ventana tras una escritura en la que las lecturas del usuario van al primario
+READ_YOUR_WRITES_SEGUNDOS = float(getenv("READ_YOUR_WRITES_SEGUNDOS", "5"))
+
+replica_engines = [
+    create_engine(url, echo=True, pool_pre_ping=True) for url in get_replica_urls()
+]
+
+class ReplicaRouter:
+    """
+    Reparte las lecturas entre las réplicas (round-robin), saltando las que
+    fallan la comprobación de salud, y recuerda qué usuarios escribieron
+    recientemente para enviar sus lecturas al primario (read-your-writes).
+    """
+
+    def __init__(self, engines: List[Engine]):
+        self.engines = engines
+        self._turno = count()
+        self._salud: Dict[int, tuple] = {} # índice -> (saludable, comprobado_en)
+        self._escrituras: Dict[str, float] = {} # usuario -> momento de la última escritura
+        self._lock = Lock()
+
+    def _saludable(self, indice: int) -> bool:
+        """Comprueba (con caché) que la réplica responde a un SELECT 1."""
+        ahora = monotonic()
+        estado = self._salud.get(indice)
+        if estado and ahora - estado[1] < REPLICA_HEALTH_INTERVAL_SEGUNDOS:
+            return estado[0]
+        try:
+            with self.engines[indice].connect() as conexion:
+                conexion.execute(text("SELECT 1"))
+            saludable = True
+        except Exception as e:
+            print(f"Réplica {indice} no disponible: {e}")
+            saludable = False
+        self._salud[indice] = (saludable, ahora)
+        return saludable
+
+    def elegir(self) -> Optional[Engine]:
+        """Devuelve la siguiente réplica saludable, o None si no hay ninguna."""
+        for _ in range(len(self.engines)):
+            indice = next(self._turno) % len(self.engines)
+            if self._saludable(indice):
+                return self.engines[indice]
+        return None
+
+    def marcar_escritura(self, usuario: str) -> None:
+        """Registra que el usuario acaba de escribir en el primario."""
+        ahora = monotonic()
+        with self._lock:
+            self._escrituras[usuario] = ahora
+            # Limpieza de entradas vencidas para que el diccionario no crezca sin límite
+            if len(self._escrituras) > 10_000:
+                self._escrituras = {
+                    u: t for u, t in self._escrituras.items() if ahora - t < READ_YOUR_WRITES_SEGUNDOS
+                }
+
+    def escritura_reciente(self, usuario: str) -> bool:
+        """Indica si el usuario escribió dentro de la ventana de read-your-writes."""
+        momento = self._escrituras.get(usuario)
+        return momento is not None and monotonic() - momento < READ_YOUR_WRITES_SEGUNDOS
+
+replica_router = ReplicaRouter(replica_engines)
+
+# --- Gestión de los Pools de Conexiones ---
+
+def todos_los_engines() -> List[Engine]:
+    """El motor primario y los de las réplicas."""
+    return [engine, *replica_engines]
+
+def descartar_conexiones_heredadas() -> None:
+    """
+    Tras un fork, abandona (sin cerrarlas) las conexiones heredadas del proceso
+    padre: cerrarlas afectaría al padre, que comparte los mismos sockets.
+    """
+    for motor in todos_los_engines():
+        motor.dispose(close=False)
+
+def cerrar_conexiones() -> None:
+    """Cierra todas las conexiones de los pools (apagado del servidor)."""
+    for motor in todos_los_engines():
+        motor.dispose()
+
 # --- Funciones de Inicialización ---
 
+# Marca de que este proceso ya creó las tablas. Con server.py las crea el maestro
+# antes del fork: los workers (también los que recicla MAX_REQUESTS) heredan la
+# marca y su lifespan no repite el create_all.
+_tablas_creadas = False
+
 def create_db_and_tables():
     """
     Crea las tablas en la base de datos basándose en los modelos (SQLModel)
-    que ha importado el motor.
+    que ha importado el motor. Solo se ejecuta una vez por proceso.
     """
+    global _tablas_creadas
+    if _tablas_creadas:
+        return
+
     # Importar los modelos para que SQLModel los reconozca
-    from models import Rutina, Ejercicio, DiaSemana, Usuario
+    from models import Rutina, Ejercicio, DiaSemana, Usuario, Trabajo, RespuestaIdempotente, VersionCache
 
     print("Intentando crear la base de datos y las tablas...")
     SQLModel.metadata.create_all(engine)
     print("Base de datos y tablas creadas (o ya existentes).")
 
+    # En una réplica con replicación las tablas ya existen y create_all no ejecuta nada;
+    # en una instancia independiente (prueba local) crea el esquema que necesitan las lecturas.
+    for indice, replica in enumerate(replica_engines):
+        try:
+            SQLModel.metadata.create_all(replica)
+        except Exception as e:
+            print(f"No se pudieron crear las tablas en la réplica {indice}: {e}")
+    _tablas_creadas = True
+
 # --- Dependencia para las Sesiones de Base de Datos ---
 
-def get_session() -> Generator[Session, None, None]:
+METODOS_LECTURA = ("GET", "HEAD", "OPTIONS")
+# Clave de `Session.info` que marca las sesiones abiertas contra una réplica
+SESION_REPLICA = "replica"
+
+def es_sesion_replica(session: Session) -> bool:
+    """Indica si la sesión lee de una réplica (y sus datos pueden estar retrasados)."""
+    return session.info.get(SESION_REPLICA, False)
+
+def _usuario_de_request(request: Request) -> Optional[str]:
+    """Obtiene el ID de usuario ('sub') del token Bearer de la petición, si es válido."""
+    # Importación local para evitar la dependencia circular con security.py
+    from security import decode_access_token
+
+    autorizacion = request.headers.get("authorization", "")
+    if not autorizacion.lower().startswith("bearer "):
+        return None
+    payload = decode_access_token(autorizacion[7:])
+    return payload.get("sub") if payload else None
+
+def get_session(request: Request) -> Generator[Session, None, None]:
     """
-    Genera una nueva sesión de base de datos para cada solicitud.
+    Genera una nueva sesión de base de datos (primario) para cada solicitud.
+    Si la solicitud es una escritura, activa la ventana de read-your-writes del usuario.
     """
+    if replica_engines and request.method not in METODOS_LECTURA:
+        usuario = _usuario_de_request(request)
+        if usuario:
+            replica_router.marcar_escritura(usuario)
     with Session(engine) as session:
+        yield session
+
+def get_read_session(
+    request: Request,
+    primary_session: Session = Depends(get_session)
+) -> Generator[Session, None, None]:
+    """
+    Genera una sesión para lecturas. Usa una réplica (round-robin) salvo que no haya
+    réplicas saludables o el usuario haya escrito recientemente; en ese caso reutiliza
+    la sesión del primario (que no abre conexión si no se usa).
+    """
+    replica = None
+    if replica_engines:
+        usuario = _usuario_de_request(request)
+        if not (usuario and replica_router.escritura_reciente(usuario)):
+            replica = replica_router.elegir()
+
+    if replica is None:
+        yield primary_session
+        return
+    with Session(replica, info={SESION_REPLICA: True}) as session:
         yield session
\ No newline at end of file
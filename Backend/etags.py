@@ -0,0 +1,32 @@
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+
+# --- Precondiciones HTTP (ETag / If-Match) para la concurrencia optimista ---
+
+def etag_de_version(version: int) -> str:
+    """ETag de un recurso a partir de su columna `version` (p. ej. '"3"')."""
+    return f'"{version}"'
+
+def agregar_etag(response: Response, version: int) -> None:
+    """Agrega la cabecera ETag con la versión actual del recurso."""
+    response.headers["ETag"] = etag_de_version(version)
+
+def version_de_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    Obtiene la versión esperada de la cabecera If-Match.
+    Sin cabecera (o con '*') no hay precondición y se devuelve None.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    valor = if_match.strip()
+    # Aceptamos ETags débiles (W/"3") y el número sin comillas
+    if valor.startswith("W/"):
+        valor = valor[2:]
+    valor = valor.strip('"')
+    if not valor.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='La cabecera If-Match debe contener la versión del recurso (ETag), p. ej. "3".'
+        )
+    return int(valor)
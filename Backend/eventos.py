@@ -0,0 +1,77 @@
+import asyncio
+from threading import Lock
+from typing import Any, Dict, Set
+
+# --- Pub/Sub en Proceso para el Feed de Cambios ---
+
+# Eventos que puede acumular una conexión antes de considerarse lenta
+EVENTOS_MAX_PENDIENTES = 100
+# Evento que reemplaza a los descartados: el cliente debe recargar los datos
+EVENTO_RESINCRONIZAR = {"tipo": "resincronizar"}
+
+class Suscripcion:
+    """
+    Cola de eventos de una conexión. Si el cliente no consume a tiempo (cola llena),
+    se descartan los eventos pendientes y se deja un único aviso de resincronización:
+    la memoria por conexión queda acotada y nunca se bloquea a quien publica.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_pendientes: int = EVENTOS_MAX_PENDIENTES):
+        self.loop = loop
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=max_pendientes)
+        self._desbordada = False
+
+    def _encolar(self, evento: Dict[str, Any]) -> None:
+        """Agrega un evento a la cola (se ejecuta siempre en el loop de la conexión)."""
+        if self._desbordada:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(EVENTO_RESINCRONIZAR)
+            self._desbordada = True
+
+    async def siguiente(self) -> Dict[str, Any]:
+        """Espera el próximo evento a enviar."""
+        evento = await self.cola.get()
+        if evento is EVENTO_RESINCRONIZAR:
+            self._desbordada = False
+        return evento
+
+class BusEventos:
+    """Distribuye los eventos de cambio a todas las conexiones suscritas del proceso."""
+
+    def __init__(self):
+        self._suscripciones: Set[Suscripcion] = set()
+        self._lock = Lock()
+
+    def suscribir(self) -> Suscripcion:
+        """Registra una nueva conexión. Debe llamarse desde el loop de la conexión."""
+        suscripcion = Suscripcion(asyncio.get_running_loop())
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion: Suscripcion) -> None:
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def publicar(self, tipo: str, **datos: Any) -> None:
+        """
+        Publica un evento compacto (p. ej. {"tipo": "rutina_creada", "rutina_id": 3}).
+        Es seguro llamarla desde cualquier hilo: el repositorio se ejecuta en el
+        threadpool de FastAPI o en los hilos de la cola de trabajos.
+        """
+        evento = {"tipo": tipo, **datos}
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._encolar, evento)
+            except RuntimeError:
+                # El loop de la conexión ya se cerró
+                self.desuscribir(suscripcion)
+
+bus_eventos = BusEventos()
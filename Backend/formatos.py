@@ -0,0 +1,152 @@
+import json
+from datetime import datetime, timezone
+from typing import Any, Optional, Tuple
+
+import msgpack
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+# --- Negociación de Contenido ---
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Alias que todavía usan algunos clientes
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+# Parámetro del Accept que solicita el formato tabular para listas de ejercicios
+LAYOUT_TABLA = "tabla"
+# Campos datetime que se envían como Timestamp nativo de MessagePack
+CAMPOS_FECHA = ("fecha_creacion",)
+
+def _calidad(parametros: dict) -> float:
+    """Valor q de un rango de media types (1 si no se indica o es inválido)."""
+    try:
+        return float(parametros.get("q", "1"))
+    except ValueError:
+        return 1.0
+
+def negociar_formato(accept: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Analiza la cabecera Accept y devuelve (media type, layout).
+    El media type es `application/msgpack` o None (JSON por defecto);
+    el layout es 'tabla' si se pidió con `; layout=tabla`.
+    Entre los formatos soportados gana el de mayor q (a igual q, el primero listado).
+    """
+    candidatos = []
+    for rango in accept.split(","):
+        partes = [parte.strip() for parte in rango.split(";")]
+        media_type = partes[0].lower()
+        parametros = {
+            clave.strip().lower(): valor.strip()
+            for clave, valor in (parametro.split("=", 1) for parametro in partes[1:] if "=" in parametro)
+        }
+        calidad = _calidad(parametros)
+        if calidad > 0 and (media_type in MSGPACK_MEDIA_TYPES or media_type == "application/json"):
+            candidatos.append((calidad, media_type, parametros))
+    if not candidatos:
+        return None, None
+
+    # sorted es estable: a igual q se respeta el orden de la cabecera
+    _, media_type, parametros = sorted(candidatos, key=lambda candidato: -candidato[0])[0]
+    layout = parametros.get("layout", "").lower() or None
+    return (MSGPACK_MEDIA_TYPE if media_type in MSGPACK_MEDIA_TYPES else None), layout
+
+# --- Transformaciones de la Carga Útil ---
+
+def a_tabla(filas: list) -> Any:
+    """
+    Convierte una lista de objetos con las mismas claves en el formato columnar
+    {"columnas": [...], "filas": [[...], ...]}, evitando repetir las claves.
+    """
+    if not filas or not all(isinstance(fila, dict) for fila in filas):
+        return filas
+    columnas = list(filas[0].keys())
+    if any(fila.keys() != filas[0].keys() for fila in filas):
+        return filas
+    return {"columnas": columnas, "filas": [[fila[columna] for columna in columnas] for fila in filas]}
+
+def es_lista_de_ejercicios(ruta: str) -> bool:
+    """Rutas cuya respuesta es directamente una lista de ejercicios (POST /rutinas/{id}/ejercicios)."""
+    return ruta.rstrip("/").endswith("/ejercicios")
+
+def aplicar_layout_tabla(datos: Any, lista_de_ejercicios: bool = False) -> Any:
+    """
+    Aplica el formato tabular a las listas de ejercicios de la respuesta: la lista
+    `ejercicios` del detalle de rutina o, si `lista_de_ejercicios`, la respuesta
+    completa. Las demás listas (p. ej. la búsqueda de rutinas) no se modifican.
+    """
+    if isinstance(datos, list):
+        return a_tabla(datos) if lista_de_ejercicios else datos
+    if isinstance(datos, dict) and isinstance(datos.get("ejercicios"), list):
+        return {**datos, "ejercicios": a_tabla(datos["ejercicios"])}
+    return datos
+
+def _convertir_fechas(datos: Any) -> Any:
+    """Reemplaza las fechas ISO conocidas por Timestamps de MessagePack."""
+    if isinstance(datos, list):
+        return [_convertir_fechas(elemento) for elemento in datos]
+    if isinstance(datos, dict):
+        convertido = {}
+        for clave, valor in datos.items():
+            if clave in CAMPOS_FECHA and isinstance(valor, str):
+                fecha = datetime.fromisoformat(valor)
+                if fecha.tzinfo is None:
+                    # Las fechas se guardan en UTC sin zona horaria (datetime.utcnow)
+                    fecha = fecha.replace(tzinfo=timezone.utc)
+                convertido[clave] = msgpack.Timestamp.from_datetime(fecha)
+            else:
+                convertido[clave] = _convertir_fechas(valor)
+        return convertido
+    return datos
+
+def codificar_msgpack(datos: Any) -> bytes:
+    """Serializa la carga útil (ya compatible con JSON) a MessagePack."""
+    return msgpack.packb(_convertir_fechas(datos), use_bin_type=True)
+
+def decodificar_msgpack(contenido: bytes) -> Any:
+    """Deserializa MessagePack convirtiendo los Timestamps en datetime (UTC)."""
+    return msgpack.unpackb(contenido, raw=False, timestamp=3)
+
+# --- Middleware ---
+
+def aplica_formatos(ruta: str) -> bool:
+    """Rutas que admiten MessagePack y el formato tabular: rutinas y ejercicios."""
+    return ruta.startswith("/api/rutinas") or ruta.startswith("/api/ejercicios")
+
+class MsgPackMiddleware(BaseHTTPMiddleware):
+    """
+    Negocia el formato de respuesta de los endpoints de rutinas y ejercicios según
+    la cabecera Accept: JSON (por defecto) o MessagePack, con formato tabular
+    opcional para las listas de ejercicios.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        if not aplica_formatos(request.url.path):
+            return await call_next(request)
+
+        media_type, layout = negociar_formato(request.headers.get("accept", ""))
+        respuesta = await call_next(request)
+
+        if (media_type is None and layout != LAYOUT_TABLA) or \
+                not respuesta.headers.get("content-type", "").startswith("application/json"):
+            respuesta.headers.append("Vary", "Accept")
+            return respuesta
+
+        cuerpo = b"".join([fragmento async for fragmento in respuesta.body_iterator])
+        datos = json.loads(cuerpo) if cuerpo else None
+        if layout == LAYOUT_TABLA:
+            datos = aplicar_layout_tabla(datos, es_lista_de_ejercicios(request.url.path))
+
+        if media_type == MSGPACK_MEDIA_TYPE:
+            nueva = Response(
+                content=codificar_msgpack(datos), status_code=respuesta.status_code, media_type=MSGPACK_MEDIA_TYPE,
+            )
+        else:
+            nueva = Response(
+                content=json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                status_code=respuesta.status_code, media_type="application/json",
+            )
+        # Se copian como pares para no fusionar cabeceras repetidas (p. ej. Set-Cookie)
+        for nombre, valor in respuesta.headers.items():
+            if nombre.lower() not in ("content-length", "content-type"):
+                nueva.headers.append(nombre, valor)
+        nueva.headers.append("Vary", "Accept")
+        return nueva
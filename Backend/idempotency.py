@@ -0,0 +1,307 @@
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from hashlib import sha256
+from os import getenv
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, delete
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from cache import TTLCache
+from database import engine
+from models import RespuestaIdempotente
+from rate_limit import identificar_cliente
+
+# --- Configuración ---
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_SEGUNDOS = 60 * 60 * 24 # Las claves se recuerdan durante 24 horas
+IDEMPOTENCY_MAX_RESPUESTAS = 10_000
+IDEMPOTENCY_MAX_LONGITUD_CLAVE = 255
+# Tiempo máximo que un reintento concurrente espera a la petición original
+IDEMPOTENCY_ESPERA_SEGUNDOS = 30
+# Cada cuánto un duplicado en otro worker vuelve a consultar la clave reclamada
+IDEMPOTENCY_SONDEO_SEGUNDOS = 0.2
+# Vigencia de un reclamo sin completar: si el worker que lo tomó cae, la clave se libera
+IDEMPOTENCY_RECLAMO_SEGUNDOS = 60 * 5
+# Cada cuánto se borran de la tabla las respuestas vencidas
+IDEMPOTENCY_LIMPIEZA_SEGUNDOS = 60 * 10
+
+def aplica_idempotencia(metodo: str, ruta: str) -> bool:
+    """Rutas que aceptan Idempotency-Key: los POST de rutinas y de sus ejercicios."""
+    return metodo == "POST" and (ruta == "/api/rutinas" or ruta.startswith("/api/rutinas/"))
+
+def crear_respuesta(cuerpo: bytes, status_code: int, headers: List[Tuple[str, str]]) -> Response:
+    """Construye una respuesta conservando las cabeceras repetidas (p. ej. Set-Cookie)."""
+    respuesta = Response(content=cuerpo, status_code=status_code)
+    for nombre, valor in headers:
+        respuesta.headers.append(nombre, valor)
+    return respuesta
+
+# --- Almacenamiento de Respuestas ---
+
+@dataclass(frozen=True)
+class RespuestaGuardada:
+    """Respuesta original almacenada para repetirla ante reintentos."""
+    huella: str # Hash del cuerpo de la petición original
+    status_code: Optional[int] # None: la petición original sigue en curso
+    headers: List[Tuple[str, str]]
+    cuerpo: bytes
+
+    @property
+    def pendiente(self) -> bool:
+        return self.status_code is None
+
+    def reproducir(self) -> Response:
+        respuesta = crear_respuesta(self.cuerpo, self.status_code, self.headers)
+        respuesta.headers["Idempotent-Replayed"] = "true"
+        return respuesta
+
+class AlmacenRespuestas(ABC):
+    """
+    Interfaz de almacenamiento de las respuestas. Antes de ejecutar la petición se
+    reclama la clave (queda pendiente); al terminar se guarda la respuesta o se libera.
+    """
+
+    # Los almacenes que hacen E/S bloqueante se ejecutan fuera del event loop
+    bloqueante: bool = False
+
+    @abstractmethod
+    def obtener(self, clave: str) -> Optional[RespuestaGuardada]:
+        """Devuelve la respuesta (o el reclamo pendiente) de la clave, o None si no existe o venció."""
+
+    @abstractmethod
+    def reclamar(self, clave: str, huella: str) -> bool:
+        """Reclama la clave para ejecutar la petición. False si otro ya la tiene."""
+
+    @abstractmethod
+    def guardar(self, clave: str, respuesta: RespuestaGuardada) -> None:
+        """Completa la clave reclamada con la respuesta de la petición original."""
+
+    @abstractmethod
+    def liberar(self, clave: str) -> None:
+        """Descarta el reclamo de una petición que no se guarda (5xx o excepción)."""
+
+class MemoriaAlmacenRespuestas(AlmacenRespuestas):
+    """Respuestas en una caché acotada con TTL, propia de cada proceso."""
+
+    def __init__(self):
+        self._respuestas = TTLCache(ttl_segundos=IDEMPOTENCY_TTL_SEGUNDOS, max_entradas=IDEMPOTENCY_MAX_RESPUESTAS)
+
+    def obtener(self, clave: str) -> Optional[RespuestaGuardada]:
+        return self._respuestas.get(clave)
+
+    def reclamar(self, clave: str, huella: str) -> bool:
+        # Sin E/S: se ejecuta en el event loop, así que comprobar y escribir es atómico
+        if self._respuestas.get(clave) is not None:
+            return False
+        self._respuestas.set(clave, RespuestaGuardada(huella, None, [], b""))
+        return True
+
+    def guardar(self, clave: str, respuesta: RespuestaGuardada) -> None:
+        self._respuestas.set(clave, respuesta)
+
+    def liberar(self, clave: str) -> None:
+        self._respuestas.invalidate(clave)
+
+class DBAlmacenRespuestas(AlmacenRespuestas):
+    """
+    Respuestas en la tabla `respuestaidempotente` del primario: las comparten todos
+    los workers y sobreviven a los reinicios. El reclamo es un INSERT atómico, así que
+    de dos duplicados concurrentes en distintos workers solo uno ejecuta el POST; el
+    otro sondea la fila hasta que se complete. Las filas vencidas se borran periódicamente.
+    """
+
+    bloqueante = True
+
+    def __init__(self):
+        self._ultima_limpieza = monotonic()
+
+    def obtener(self, clave: str) -> Optional[RespuestaGuardada]:
+        with Session(engine) as session:
+            fila = session.get(RespuestaIdempotente, clave)
+            if fila is None or fila.expira_en <= datetime.utcnow():
+                return None
+            return RespuestaGuardada(
+                fila.huella, fila.status_code, [tuple(header) for header in fila.headers], fila.cuerpo
+            )
+
+    def reclamar(self, clave: str, huella: str) -> bool:
+        ahora = datetime.utcnow()
+        insertar = postgresql_insert if engine.dialect.name == "postgresql" else sqlite_insert
+        reclamo = insertar(RespuestaIdempotente).values(
+            clave=clave,
+            huella=huella,
+            status_code=None,
+            headers=[],
+            cuerpo=b"",
+            expira_en=ahora + timedelta(seconds=IDEMPOTENCY_RECLAMO_SEGUNDOS),
+        )
+        # Si la clave existe no se toca, salvo que haya vencido (respuesta caducada
+        # o reclamo de un worker caído): entonces se reclama en la misma sentencia
+        reclamo = reclamo.on_conflict_do_update(
+            index_elements=[RespuestaIdempotente.clave],
+            set_={columna: reclamo.excluded[columna] for columna in ("huella", "status_code", "headers", "cuerpo", "expira_en")},
+            where=RespuestaIdempotente.expira_en <= ahora,
+        )
+        with Session(engine) as session:
+            resultado = session.exec(reclamo)
+            session.commit()
+            return resultado.rowcount == 1
+
+    def guardar(self, clave: str, respuesta: RespuestaGuardada) -> None:
+        ahora = datetime.utcnow()
+        with Session(engine) as session:
+            session.exec(
+                update(RespuestaIdempotente)
+                .where(RespuestaIdempotente.clave == clave, RespuestaIdempotente.status_code.is_(None))
+                .values(
+                    status_code=respuesta.status_code,
+                    headers=[list(header) for header in respuesta.headers],
+                    cuerpo=respuesta.cuerpo,
+                    expira_en=ahora + timedelta(seconds=IDEMPOTENCY_TTL_SEGUNDOS),
+                )
+            )
+            session.commit()
+            if monotonic() - self._ultima_limpieza >= IDEMPOTENCY_LIMPIEZA_SEGUNDOS:
+                self._ultima_limpieza = monotonic()
+                session.exec(delete(RespuestaIdempotente).where(RespuestaIdempotente.expira_en <= ahora))
+                session.commit()
+
+    def liberar(self, clave: str) -> None:
+        with Session(engine) as session:
+            session.exec(
+                delete(RespuestaIdempotente)
+                .where(RespuestaIdempotente.clave == clave, RespuestaIdempotente.status_code.is_(None))
+            )
+            session.commit()
+
+def crear_almacen() -> AlmacenRespuestas:
+    """Crea el almacén configurado en IDEMPOTENCY_BACKEND ('db' por defecto o 'memoria')."""
+    tipo = getenv("IDEMPOTENCY_BACKEND", "db").lower()
+    if tipo == "db":
+        return DBAlmacenRespuestas()
+    if tipo == "memoria":
+        return MemoriaAlmacenRespuestas()
+    raise ValueError(f"IDEMPOTENCY_BACKEND desconocido: '{tipo}'. Usa 'db' o 'memoria'.")
+
+# --- Middleware ---
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    """
+    Ejecuta una sola vez cada POST con la misma Idempotency-Key (por usuario y ruta).
+    Los reintentos reciben la respuesta original desde el almacén configurado, y
+    los duplicados concurrentes esperan el resultado de la petición en curso: en el
+    mismo proceso con un future y en otros workers sondeando la clave reclamada.
+    """
+
+    def __init__(self, app, almacen: Optional[AlmacenRespuestas] = None):
+        super().__init__(app)
+        self.almacen = almacen or crear_almacen()
+        self._en_curso: Dict[str, asyncio.Future] = {}
+
+    async def _obtener(self, clave: str) -> Optional[RespuestaGuardada]:
+        if self.almacen.bloqueante:
+            return await run_in_threadpool(self.almacen.obtener, clave)
+        return self.almacen.obtener(clave)
+
+    async def _reclamar(self, clave: str, huella: str) -> bool:
+        if self.almacen.bloqueante:
+            return await run_in_threadpool(self.almacen.reclamar, clave, huella)
+        return self.almacen.reclamar(clave, huella)
+
+    async def _guardar(self, clave: str, respuesta: RespuestaGuardada) -> None:
+        if self.almacen.bloqueante:
+            await run_in_threadpool(self.almacen.guardar, clave, respuesta)
+        else:
+            self.almacen.guardar(clave, respuesta)
+
+    async def _liberar(self, clave: str) -> None:
+        if self.almacen.bloqueante:
+            await run_in_threadpool(self.almacen.liberar, clave)
+        else:
+            self.almacen.liberar(clave)
+
+    async def dispatch(self, request: Request, call_next):
+        clave_cliente = request.headers.get(IDEMPOTENCY_HEADER)
+        if not clave_cliente or not aplica_idempotencia(request.method, request.url.path):
+            return await call_next(request)
+
+        if len(clave_cliente) > IDEMPOTENCY_MAX_LONGITUD_CLAVE:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"detail": f"La cabecera {IDEMPOTENCY_HEADER} no puede superar {IDEMPOTENCY_MAX_LONGITUD_CLAVE} caracteres."},
+            )
+
+        clave = sha256(
+            "\n".join((identificar_cliente(request), request.url.path, clave_cliente)).encode("utf-8")
+        ).hexdigest()
+        huella = sha256(await request.body()).hexdigest()
+
+        # Si hay una petición en curso con la misma clave, esperamos su resultado
+        limite_espera = monotonic() + IDEMPOTENCY_ESPERA_SEGUNDOS
+        while True:
+            guardada = await self._obtener(clave)
+            if guardada is not None and guardada.huella != huella:
+                return JSONResponse(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    content={"detail": f"La {IDEMPOTENCY_HEADER} ya se usó con una solicitud distinta."},
+                )
+            if guardada is not None and not guardada.pendiente:
+                return guardada.reproducir()
+
+            restante = limite_espera - monotonic()
+            en_curso = self._en_curso.get(clave)
+            if guardada is None and en_curso is None:
+                if await self._reclamar(clave, huella):
+                    break
+                # Otro worker la reclamó entre la consulta y el INSERT: volvemos a consultar
+                continue
+            if restante <= 0:
+                return JSONResponse(
+                    status_code=status.HTTP_409_CONFLICT,
+                    content={"detail": "Una solicitud con la misma Idempotency-Key todavía se está procesando."},
+                    headers={"Retry-After": "1"},
+                )
+            if en_curso is not None:
+                # En este proceso: shield para que la original siga si este reintento deja de esperar
+                try:
+                    await asyncio.wait_for(asyncio.shield(en_curso), timeout=restante)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                # Reclamada por otro worker: sondeamos la fila hasta que se complete o se libere
+                await asyncio.sleep(min(IDEMPOTENCY_SONDEO_SEGUNDOS, restante))
+            # Si la original falló (5xx) se liberó la clave y este reintento la reclama
+
+        en_curso = asyncio.get_running_loop().create_future()
+        self._en_curso[clave] = en_curso
+        completada = False
+        try:
+            respuesta = await call_next(request)
+            cuerpo = b"".join([fragmento async for fragmento in respuesta.body_iterator])
+            headers = [
+                (nombre, valor) for nombre, valor in respuesta.headers.items()
+                if nombre.lower() != "content-length"
+            ]
+            # Los errores del servidor no se guardan: el cliente debe poder reintentar
+            if respuesta.status_code < 500:
+                await self._guardar(clave, RespuestaGuardada(huella, respuesta.status_code, headers, cuerpo))
+                completada = True
+            return crear_respuesta(cuerpo, respuesta.status_code, headers)
+        finally:
+            try:
+                if not completada:
+                    await self._liberar(clave)
+            finally:
+                del self._en_curso[clave]
+                en_curso.set_result(None)
@@ -1,8 +1,13 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import create_db_and_tables
-from routers import auth, rutinas, ejercicios
+from fastapi.middleware.gzip import GZipMiddleware
+from database import create_db_and_tables, cerrar_conexiones
+from formatos import MsgPackMiddleware
+from idempotency import IdempotencyMiddleware
+from rate_limit import RateLimitMiddleware
+from routers import auth, rutinas, ejercicios, estadisticas, trabajos, cambios
+from cola_trabajos import iniciar_trabajos, detener_trabajos
 
 # ----------------------------------------------------
 # Definir el Context Manager de Lifespan
@@ -17,11 +22,14 @@ async def lifespan(app: FastAPI):
     # Lógica de INICIO (equivalente a @app.on_event("startup"))
     create_db_and_tables()
     print("Base de datos y tablas inicializadas.")
+    iniciar_trabajos()
     
     yield # La aplicación se ejecuta en este punto
     
-    # Lógica de APAGADO (si fuera necesaria)
+    # Lógica de APAGADO
     print("<<< Apagando el servidor...")
+    detener_trabajos()
+    cerrar_conexiones()
 
 # ----------------------------------------------------
 # Inicialización de FastAPI con lifespan
@@ -33,6 +41,34 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# ----------------------------------------------------
+# Idempotencia de los POST (cabecera Idempotency-Key)
+# ----------------------------------------------------
+app.add_middleware(IdempotencyMiddleware)
+
+# ----------------------------------------------------
+# Negociación de Formato (JSON / MessagePack)
+# ----------------------------------------------------
+
+# Va por fuera de la idempotencia: la respuesta guardada es siempre JSON y
+# cada reintento se convierte al formato que pida en su cabecera Accept.
+app.add_middleware(MsgPackMiddleware)
+
+# ----------------------------------------------------
+# Control de Admisión y Limitación de Tasa
+# ----------------------------------------------------
+
+# Se registra antes que CORS para que este quede por fuera y las respuestas
+# 429/503 también lleven las cabeceras CORS.
+app.add_middleware(RateLimitMiddleware)
+
+# ----------------------------------------------------
+# Compresión de Respuestas
+# ----------------------------------------------------
+
+# Comprime con gzip las respuestas de más de 1 KB si el cliente lo acepta.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # ----------------------------------------------------
 # Configuración del Middleware CORS
 # ----------------------------------------------------
@@ -50,6 +86,9 @@ app.add_middleware(
     allow_credentials=True,            # Permite cookies y encabezados de autenticación (JWT)
     allow_methods=["*"],               # Permite todos los métodos (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],               # Permite todos los encabezados HTTP (incluido Authorization)
+    # Cabeceras de respuesta que el navegador deja leer al frontend: ETag para
+    # If-Match, Location de los trabajos (202) y Retry-After de los 409/429/503
+    expose_headers=["ETag", "Location", "Retry-After"],
 )
 
 # ----------------------------------------------------
@@ -57,4 +96,7 @@ app.add_middleware(
 # ----------------------------------------------------
 app.include_router(rutinas.router)
 app.include_router(ejercicios.router)
+app.include_router(estadisticas.router)
+app.include_router(trabajos.router)
+app.include_router(cambios.router)
 app.include_router(auth.router)
@@ -1,8 +1,9 @@
 from datetime import datetime
 from enum import Enum
-from typing import Generic, Optional, List, TypeVar
+from typing import Any, Generic, Optional, List, TypeVar
 
-from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, func
+from sqlmodel import SQLModel, Field, Relationship, Column, JSON, LargeBinary
 
 # --- Enumeración para el Día de la Semana ---
 class DiaSemana(str, Enum):
@@ -35,6 +36,8 @@ class EjercicioBase(SQLModel):
 class Ejercicio(EjercicioBase, table=True):
     """Modelo de base de datos para un Ejercicio."""
     id: Optional[int] = Field(default=None, primary_key=True)
+    # Control de concurrencia optimista: se incrementa en cada modificación
+    version: int = Field(default=1, nullable=False, sa_column_kwargs={"server_default": "1"})
 
     # Relación de vuelta con Rutina
     rutina: "Rutina" = Relationship(back_populates="ejercicios")
@@ -56,6 +59,8 @@ class Rutina(RutinaBase, table=True):
     """Modelo de base de datos para una Rutina."""
     id: Optional[int] = Field(default=None, primary_key=True)
     fecha_creacion: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    # Control de concurrencia optimista: se incrementa en cada modificación
+    version: int = Field(default=1, nullable=False, sa_column_kwargs={"server_default": "1"})
 
     # Relación de uno a muchos con Ejercicio
     # `ejercicios` será una lista de objetos Ejercicio
@@ -64,11 +69,15 @@ class Rutina(RutinaBase, table=True):
         sa_relationship_kwargs={"cascade": "all, delete-orphan"}
         )
 
+# Unicidad del nombre insensible a mayúsculas, garantizada por la base de datos
+Index("ix_rutina_nombre_lower", func.lower(Rutina.nombre), unique=True)
+
 # Modelo de Lectura (Response) que incluye la lista de ejercicios
 class RutinaRead(RutinaBase):
     """Modelo de respuesta para Rutina, incluyendo ID, fecha y ejercicios."""
     id: int
     fecha_creacion: datetime
+    version: int
     ejercicios: List[Ejercicio] = []
 
 # Nota: Se debe definir el `Ejercicio` al final de la clase `Rutina` para evitar errores de referencia circular
@@ -90,6 +99,37 @@ class RutinaPaginatedRead(PaginacionBase[Rutina]):
     """Modelo de respuesta paginada para Rutinas."""
     pass
 
+# --- Modelos de Estadísticas de Volumen ---
+
+class VolumenBase(SQLModel):
+    """Métricas de volumen de entrenamiento de un grupo de ejercicios."""
+    total_ejercicios: int = 0
+    total_series: int = 0
+    total_repeticiones: int = 0 # Suma de series * repeticiones
+    tonelaje: float = 0.0 # Suma de series * repeticiones * peso (kg)
+
+class VolumenPorRutina(VolumenBase):
+    """Volumen agregado de una rutina."""
+    rutina_id: int
+    rutina_nombre: str
+
+class VolumenPorDia(VolumenBase):
+    """Volumen agregado de un día de la semana."""
+    dia_semana: DiaSemana
+
+class PesoMaximoEjercicio(SQLModel):
+    """Levantamiento más pesado registrado para un nombre de ejercicio."""
+    nombre: str
+    peso_maximo: Optional[float] = None
+
+class EstadisticasRead(SQLModel):
+    """Modelo de respuesta con las estadísticas de volumen de entrenamiento."""
+    resumen: VolumenBase
+    total_rutinas: int = 0 # Rutinas con ejercicios que cumplen los filtros
+    por_rutina: List[VolumenPorRutina] = [] # Acotado a `limite_rutinas` (por ID)
+    por_dia: List[VolumenPorDia] = []
+    pesos_maximos: List[PesoMaximoEjercicio] = []
+
 # --- Modelos de Usuario ----
 
 class UsuarioBase(SQLModel):
@@ -115,4 +155,61 @@ class UsuarioRead(UsuarioBase):
 class Token(SQLModel):
     """Modelo para el token de acceso JWT."""
     access_token: str
-    token_type: str = "bearer" #Tipo de token, por defecto "bearer"
\ No newline at end of file
+    token_type: str = "bearer" #Tipo de token, por defecto "bearer"
+
+# --- Modelos de Trabajos en Segundo Plano ---
+
+class EstadoTrabajo(str, Enum):
+    """Estados posibles de un trabajo en segundo plano."""
+    PENDIENTE = "Pendiente"
+    EN_PROCESO = "EnProceso"
+    COMPLETADO = "Completado"
+    FALLIDO = "Fallido"
+
+class TrabajoBase(SQLModel):
+    """Campos comunes de un trabajo en segundo plano."""
+    tipo: str # Operación ejecutada (p. ej. 'duplicar_rutina')
+    estado: EstadoTrabajo = Field(default=EstadoTrabajo.PENDIENTE)
+    progreso: int = Field(default=0, description="Porcentaje completado (0-100).")
+    error: Optional[str] = Field(default=None)
+    fecha_creacion: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    fecha_actualizacion: Optional[datetime] = Field(default=None)
+
+class Trabajo(TrabajoBase, table=True):
+    """Modelo de base de datos para un trabajo en segundo plano."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    usuario_id: Optional[int] = Field(default=None, foreign_key="usuario.id", index=True)
+    # Proceso que ejecuta el trabajo (host:pid) y último latido que registró
+    propietario: Optional[str] = Field(default=None)
+    latido: Optional[datetime] = Field(default=None, index=True)
+    # Respuesta de la operación (la misma que devolvería el endpoint síncrono)
+    resultado: Optional[Any] = Field(default=None, sa_column=Column(JSON))
+
+class TrabajoRead(TrabajoBase):
+    """Modelo de respuesta para un trabajo, incluyendo su resultado."""
+    id: int
+    resultado: Optional[Any] = None
+
+# --- Versión de las Cachés ---
+
+class VersionCache(SQLModel, table=True):
+    """
+    Versión compartida de las cachés del repositorio. Cada escritura de rutinas o
+    ejercicios la incrementa y cada worker vacía sus cachés al ver una versión nueva.
+    """
+    nombre: str = Field(primary_key=True, max_length=50)
+    version: int = Field(default=0, nullable=False)
+
+# --- Modelo de Respuestas Idempotentes ---
+
+class RespuestaIdempotente(SQLModel, table=True):
+    """Respuesta guardada de un POST con Idempotency-Key, compartida por todos los workers."""
+    # Hash de (cliente, ruta, Idempotency-Key)
+    clave: str = Field(primary_key=True, max_length=64)
+    huella: str # Hash del cuerpo de la petición original
+    # None mientras la petición original sigue en curso (la clave está reclamada)
+    status_code: Optional[int] = None
+    # Lista de pares [nombre, valor]: conserva las cabeceras repetidas (p. ej. Set-Cookie)
+    headers: List[Any] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    cuerpo: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    expira_en: datetime = Field(index=True, nullable=False)
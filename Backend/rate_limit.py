@@ -0,0 +1,276 @@
+import asyncio
+import math
+import os
+import re
+import sqlite3
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from os import getenv
+from threading import Lock
+from time import monotonic, time
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from security import decode_access_token
+
+# --- Configuración de Límites por Clase de Ruta ---
+
+@dataclass(frozen=True)
+class LimiteClase:
+    """Límites aplicados a una clase de ruta."""
+    capacidad: float      # Tamaño máximo del token bucket (ráfaga permitida)
+    tasa: float           # Tokens repuestos por segundo
+    concurrencia: int     # Peticiones simultáneas permitidas en este proceso
+    cola: int             # Peticiones que pueden esperar un hueco antes de responder 503
+    espera_maxima: float  # Segundos máximos de espera en la cola
+
+LIMITES: Dict[str, LimiteClase] = {
+    "lectura": LimiteClase(capacidad=60, tasa=10, concurrencia=32, cola=64, espera_maxima=5),
+    "escritura": LimiteClase(capacidad=30, tasa=5, concurrencia=16, cola=32, espera_maxima=5),
+    # Duplicaciones, altas masivas y búsquedas/estadísticas sin límite de resultados
+    "costosa": LimiteClase(capacidad=10, tasa=1, concurrencia=4, cola=8, espera_maxima=10),
+}
+
+def plantilla_ruta(metodo: str, ruta: str) -> str:
+    """
+    Normaliza la petición a su ruta (método + plantilla), reemplazando los IDs
+    numéricos: '/api/rutinas/5/ejercicios' -> 'POST /api/rutinas/{id}/ejercicios'.
+    Cada ruta tiene su propio token bucket por usuario.
+    """
+    return f"{metodo} {re.sub(r'/[0-9]+(?=/|$)', '/{id}', ruta)}"
+
+def clasificar_ruta(metodo: str, ruta: str) -> str:
+    """Asigna una petición a su clase de ruta ('lectura', 'escritura' o 'costosa')."""
+    if metodo == "POST" and (ruta.endswith("/duplicar") or ruta.endswith("/ejercicios")):
+        return "costosa"
+    if metodo == "GET" and ruta in ("/api/rutinas/buscar", "/api/estadisticas"):
+        return "costosa"
+    if metodo in ("GET", "HEAD"):
+        return "lectura"
+    return "escritura"
+
+# --- Backends del Estado del Limitador ---
+
+class LimiterBackend(ABC):
+    """Interfaz de almacenamiento de los token buckets."""
+
+    # Los backends que hacen E/S bloqueante se ejecutan fuera del event loop
+    bloqueante: bool = False
+
+    @abstractmethod
+    def consumir(self, clave: str, capacidad: float, tasa: float) -> float:
+        """
+        Intenta consumir un token del bucket `clave`.
+        Devuelve 0 si se concedió, o los segundos hasta que haya un token disponible.
+        """
+
+def _recargar(tokens: float, ultimo: float, ahora: float, capacidad: float, tasa: float) -> float:
+    """Repone los tokens acumulados desde el último acceso, sin superar la capacidad."""
+    return min(capacidad, tokens + (ahora - ultimo) * tasa)
+
+# Cada cuánto se descartan los buckets en memoria que ya volvieron a estar llenos
+LIMPIEZA_BUCKETS_SEGUNDOS = 60
+
+class MemoryLimiterBackend(LimiterBackend):
+    """Buckets en memoria del proceso (un estado independiente por worker)."""
+
+    def __init__(self):
+        # clave -> (tokens, último acceso, capacidad, tasa)
+        self._buckets: Dict[str, Tuple[float, float, float, float]] = {}
+        self._ultima_limpieza = monotonic()
+        self._lock = Lock()
+
+    def _limpiar(self, ahora: float) -> None:
+        """
+        Elimina los buckets inactivos que ya se recargaron por completo: un bucket
+        lleno equivale a uno inexistente, así que la memoria queda acotada a los
+        clientes activos en vez de crecer con cada IP vista.
+        """
+        self._buckets = {
+            clave: bucket for clave, bucket in self._buckets.items()
+            if _recargar(bucket[0], bucket[1], ahora, bucket[2], bucket[3]) < bucket[2]
+        }
+        self._ultima_limpieza = ahora
+
+    def consumir(self, clave: str, capacidad: float, tasa: float) -> float:
+        ahora = monotonic()
+        with self._lock:
+            if ahora - self._ultima_limpieza >= LIMPIEZA_BUCKETS_SEGUNDOS:
+                self._limpiar(ahora)
+            tokens, ultimo, _, _ = self._buckets.get(clave, (capacidad, ahora, capacidad, tasa))
+            tokens = _recargar(tokens, ultimo, ahora, capacidad, tasa)
+            if tokens >= 1:
+                self._buckets[clave] = (tokens - 1, ahora, capacidad, tasa)
+                return 0.0
+            self._buckets[clave] = (tokens, ahora, capacidad, tasa)
+            return (1 - tokens) / tasa
+
+class SQLiteLimiterBackend(LimiterBackend):
+    """
+    Buckets en un archivo SQLite local, compartido por todos los workers del host.
+    Sustituye a un almacén externo (p. ej. Redis) sin agregar infraestructura.
+    """
+
+    # Puede esperar hasta 1 s por el bloqueo del archivo
+    bloqueante = True
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._conexion: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._ultima_limpieza = time()
+        # Mayor tiempo (capacidad / tasa) que tarda en llenarse un bucket vacío
+        self._recarga_maxima = 0.0
+        self._lock = Lock()
+
+    def _conectar(self) -> sqlite3.Connection:
+        # La conexión se abre de forma perezosa y por proceso: no debe heredarse tras un fork
+        if self._conexion is None or self._pid != os.getpid():
+            self._conexion = sqlite3.connect(
+                self.ruta, timeout=1, isolation_level=None, check_same_thread=False
+            )
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS bucket (clave TEXT PRIMARY KEY, tokens REAL, ultimo REAL)"
+            )
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS ix_bucket_ultimo ON bucket (ultimo)")
+            self._pid = os.getpid()
+        return self._conexion
+
+    def consumir(self, clave: str, capacidad: float, tasa: float) -> float:
+        # Reloj de pared: debe ser comparable entre procesos
+        ahora = time()
+        with self._lock:
+            self._recarga_maxima = max(self._recarga_maxima, capacidad / tasa)
+            conexion = self._conectar()
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                fila = conexion.execute(
+                    "SELECT tokens, ultimo FROM bucket WHERE clave = ?", (clave,)
+                ).fetchone()
+                tokens, ultimo = fila if fila else (capacidad, ahora)
+                tokens = _recargar(tokens, ultimo, ahora, capacidad, tasa)
+                espera = 0.0 if tokens >= 1 else (1 - tokens) / tasa
+                if espera == 0.0:
+                    tokens -= 1
+                conexion.execute(
+                    "INSERT OR REPLACE INTO bucket (clave, tokens, ultimo) VALUES (?, ?, ?)",
+                    (clave, tokens, ahora),
+                )
+                if ahora - self._ultima_limpieza >= LIMPIEZA_BUCKETS_SEGUNDOS:
+                    # Un bucket inactivo durante más que el mayor tiempo de recarga ya está
+                    # lleno y equivale a uno inexistente: la tabla no crece con cada IP vista
+                    conexion.execute(
+                        "DELETE FROM bucket WHERE ultimo < ?", (ahora - self._recarga_maxima,)
+                    )
+                    self._ultima_limpieza = ahora
+                conexion.execute("COMMIT")
+            except Exception:
+                conexion.execute("ROLLBACK")
+                raise
+            return espera
+
+def crear_backend() -> LimiterBackend:
+    """Crea el backend configurado en RATE_LIMIT_BACKEND ('memoria' por defecto o 'sqlite')."""
+    tipo = getenv("RATE_LIMIT_BACKEND", "memoria").lower()
+    if tipo == "sqlite":
+        ruta = getenv("RATE_LIMIT_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "gym_rate_limit.sqlite3"))
+        return SQLiteLimiterBackend(ruta)
+    if tipo == "memoria":
+        return MemoryLimiterBackend()
+    raise ValueError(f"RATE_LIMIT_BACKEND desconocido: '{tipo}'. Usa 'memoria' o 'sqlite'.")
+
+# --- Control de Concurrencia (Admisión) ---
+
+class _LimiteConcurrencia:
+    """Semáforo con cola acotada: rechaza en vez de encolar indefinidamente."""
+
+    def __init__(self, limite: LimiteClase):
+        self.limite = limite
+        self._semaforo = asyncio.Semaphore(limite.concurrencia)
+        self._esperando = 0
+
+    async def adquirir(self) -> bool:
+        """Obtiene un hueco. Devuelve False si la cola está llena o se agota la espera."""
+        if self._semaforo.locked() and self._esperando >= self.limite.cola:
+            return False
+        self._esperando += 1
+        try:
+            await asyncio.wait_for(self._semaforo.acquire(), timeout=self.limite.espera_maxima)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._esperando -= 1
+
+    def liberar(self) -> None:
+        self._semaforo.release()
+
+# --- Middleware ---
+
+def _respuesta_rechazo(codigo: int, detalle: str, reintentar_en: float) -> JSONResponse:
+    """Respuesta rápida 429/503 con la cabecera Retry-After (en segundos enteros)."""
+    return JSONResponse(
+        status_code=codigo,
+        content={"detail": detalle},
+        headers={"Retry-After": str(max(1, math.ceil(reintentar_en)))},
+    )
+
+def identificar_cliente(request: Request) -> str:
+    """Identifica al usuario por el 'sub' del JWT o, si no hay token válido, por su IP."""
+    autorizacion = request.headers.get("authorization", "")
+    if autorizacion.lower().startswith("bearer "):
+        payload = decode_access_token(autorizacion[7:])
+        if payload and payload.get("sub"):
+            return f"usuario:{payload['sub']}"
+    return f"ip:{request.client.host if request.client else 'desconocida'}"
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Limita la tasa de peticiones por usuario y clase de ruta (token bucket) y
+    la concurrencia global por clase de ruta, respondiendo 429/503 con Retry-After.
+    """
+
+    def __init__(self, app, backend: Optional[LimiterBackend] = None):
+        super().__init__(app)
+        self.backend = backend or crear_backend()
+        self._concurrencia = {clase: _LimiteConcurrencia(limite) for clase, limite in LIMITES.items()}
+
+    async def dispatch(self, request: Request, call_next):
+        # Solo se limita la API; las preflight CORS y la documentación quedan fuera
+        if request.method == "OPTIONS" or not request.url.path.startswith("/api"):
+            return await call_next(request)
+
+        clase = clasificar_ruta(request.method, request.url.path)
+        limite = LIMITES[clase]
+
+        # El bucket es por usuario y ruta; la clase solo fija sus límites y la concurrencia
+        clave = f"{identificar_cliente(request)}:{plantilla_ruta(request.method, request.url.path)}"
+        if self.backend.bloqueante:
+            # Fuera del event loop: una espera por el bloqueo no debe frenar al resto de conexiones
+            espera = await run_in_threadpool(self.backend.consumir, clave, limite.capacidad, limite.tasa)
+        else:
+            espera = self.backend.consumir(clave, limite.capacidad, limite.tasa)
+        if espera > 0:
+            return _respuesta_rechazo(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Demasiadas solicitudes. Intenta nuevamente más tarde.",
+                espera,
+            )
+
+        concurrencia = self._concurrencia[clase]
+        if not await concurrencia.adquirir():
+            return _respuesta_rechazo(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "El servidor está saturado. Intenta nuevamente más tarde.",
+                limite.espera_maxima,
+            )
+        try:
+            return await call_next(request)
+        finally:
+            concurrencia.liberar()
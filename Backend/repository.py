@@ -1,8 +1,17 @@
-from typing import List, Optional, Tuple, TypeVar
+from typing import Callable, List, Optional, Tuple, TypeVar
 
-from sqlmodel import SQLModel, Session, select, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel, Session, select, func, update
 
-from models import Rutina, RutinaBase, Ejercicio, EjercicioBase
+from cache import TTLCache
+from database import es_sesion_replica
+from eventos import bus_eventos
+from models import (
+    Rutina, RutinaBase, Ejercicio, EjercicioBase, DiaSemana,
+    EstadisticasRead, VolumenBase, VolumenPorRutina, VolumenPorDia, PesoMaximoEjercicio, VersionCache
+)
 
 # --- Excepción Personalizada para Manejo de Errores ---
 
@@ -10,6 +19,10 @@ class RutinaNameTakenError(Exception):
     """Excepción lanzada cuando el nombre de una rutina ya existe."""
     pass
 
+class VersionConflictError(Exception):
+    """Excepción lanzada cuando se intenta modificar una versión desactualizada de un recurso."""
+    pass
+
 # --- Funciones de Utilidad de Búsqueda ---
 
 def get_rutina_by_name(session: Session, name: str) -> Optional[Rutina]:
@@ -32,8 +45,18 @@ def create_rutina(session: Session, rutina_in: RutinaBase) -> Rutina:
     db_rutina = Rutina.model_validate(rutina_in)
     
     session.add(db_rutina)
-    session.commit()
+    try:
+        _marcar_caches_obsoletas(session)
+        session.commit()
+    except IntegrityError:
+        # Otra petición creó el mismo nombre entre la validación y el INSERT:
+        # lo detecta el índice único sobre lower(nombre)
+        session.rollback()
+        raise RutinaNameTakenError(f"Ya existe una rutina con el nombre '{rutina_in.nombre}'.")
     session.refresh(db_rutina)
+    # Una rutina nueva no tiene ejercicios: solo cambia el total sin filtro
+    invalidar_conteos(None)
+    bus_eventos.publicar("rutina_creada", rutina_id=db_rutina.id)
     return db_rutina
 
 def add_ejercicio_to_rutina(
@@ -59,19 +82,32 @@ def add_ejercicio_to_rutina(
         db_ejercicio.orden = (max_order if max_order is not None else 0) + 1
 
     session.add(db_ejercicio)
+    _incrementar_version_rutina(session, rutina_id)
+    _marcar_caches_obsoletas(session)
     session.commit()
     session.refresh(db_ejercicio)
+    invalidar_estadisticas()
+    invalidar_conteos(db_ejercicio.dia_semana)
+    bus_eventos.publicar("ejercicio_agregado", rutina_id=rutina_id, ejercicio_ids=[db_ejercicio.id])
     return db_ejercicio
 
 def add_multiple_ejercicios_to_rutina(
-    session: Session, rutina_id: int, ejercicios_in: List[EjercicioBase]
+    session: Session,
+    rutina_id: int,
+    ejercicios_in: List[EjercicioBase],
+    al_progresar: Optional[Callable[[int], None]] = None
 ) -> List[Ejercicio]:
     """
     Agrega múltiples ejercicios a una rutina específica.
     Requisito: Asignar un orden automático si no se especifica.
+    Si se indica `al_progresar`, se le informa el porcentaje de ejercicios procesados.
     """
+    # Sin ejercicios no hay nada que escribir, invalidar ni notificar
+    if not ejercicios_in:
+        return []
+
     db_ejercicios = []
-    for ejercicio_in in ejercicios_in:
+    for indice, ejercicio_in in enumerate(ejercicios_in, start=1):
         # Creamos el objeto Ejercicio. El 'rutina_id' es obligatorio en la DB.
         db_ejercicio = Ejercicio.model_validate(ejercicio_in, update={'rutina_id': rutina_id})
         
@@ -89,10 +125,20 @@ def add_multiple_ejercicios_to_rutina(
 
         session.add(db_ejercicio)
         db_ejercicios.append(db_ejercicio)
+        if al_progresar:
+            al_progresar(indice * 100 // len(ejercicios_in))
         
+    _incrementar_version_rutina(session, rutina_id)
+    _marcar_caches_obsoletas(session)
     session.commit()
     for db_ejercicio in db_ejercicios:
         session.refresh(db_ejercicio)
+    invalidar_estadisticas()
+    invalidar_conteos(*{db_ejercicio.dia_semana for db_ejercicio in db_ejercicios})
+    # Un único evento para todo el lote
+    bus_eventos.publicar(
+        "ejercicio_agregado", rutina_id=rutina_id, ejercicio_ids=[db_ejercicio.id for db_ejercicio in db_ejercicios]
+    )
     
     return db_ejercicios
 
@@ -111,43 +157,150 @@ def delete_rutina_by_id(session: Session, rutina_id: int) -> Optional[Rutina]:
         return None
         
     session.delete(rutina)
+    _marcar_caches_obsoletas(session)
     session.commit()
+    invalidar_estadisticas()
+    invalidar_conteos()
+    bus_eventos.publicar("rutina_eliminada", rutina_id=rutina_id)
     return rutina # Devolvemos la rutina eliminada para confirmación
 
 # --- Modificación de Rutina y Ejercicio (Update) ---
 
-def update_rutina(session: Session, rutina: Rutina, rutina_in: RutinaBase) -> Rutina:
+def _update_condicional(
+    session: Session, modelo, objeto_id: int, version: Optional[int], datos: dict, columnas_anteriores: tuple = ()
+) -> Optional[tuple]:
+    """
+    Ejecuta un único `UPDATE ... WHERE id = ? [AND version = ?] RETURNING *` que además
+    incrementa la versión. Devuelve (objeto actualizado, *valores anteriores de
+    `columnas_anteriores`), None si no existe, o lanza VersionConflictError si la versión
+    esperada ya no es la actual. No hace commit: el llamador puede agregar más
+    sentencias a la misma transacción.
+    """
+    condiciones = [modelo.id == objeto_id]
+    if version is not None:
+        condiciones.append(modelo.version == version)
+    statement = update(modelo).values(**datos, version=modelo.version + 1)
+
+    anteriores = ()
+    if columnas_anteriores and session.get_bind().dialect.name == "postgresql":
+        # UPDATE ... FROM (SELECT ...) anterior: la subconsulta ve la fila antes del cambio
+        # y RETURNING devuelve los valores previos en la misma sentencia
+        anterior = select(modelo.id, *columnas_anteriores).where(modelo.id == objeto_id).subquery("anterior")
+        condiciones.append(modelo.id == anterior.c.id)
+        columnas_retorno = [anterior.c[columna.key] for columna in columnas_anteriores]
+    else:
+        if columnas_anteriores:
+            # Otros motores (SQLite) no admiten columnas del FROM en RETURNING:
+            # se leen antes, dentro de la misma transacción
+            anteriores = tuple(
+                session.exec(select(*columnas_anteriores).where(modelo.id == objeto_id)).one_or_none() or ()
+            )
+        columnas_retorno = []
+    statement = (
+        statement.where(*condiciones)
+        .returning(modelo, *columnas_retorno)
+        .execution_options(synchronize_session=False)
+    )
+    fila = session.exec(statement).one_or_none()
+
+    if fila is None:
+        session.rollback()
+        # Solo en el caso de fallo: distinguimos "no existe" de "versión desactualizada"
+        actual = session.get(modelo, objeto_id)
+        if actual is None:
+            return None
+        raise VersionConflictError(
+            f"El recurso fue modificado por otro usuario (versión actual {actual.version}, "
+            f"versión enviada {version}). Recarga los datos e intenta nuevamente."
+        )
+
+    # Lo separamos de la sesión para que el commit no lo expire: los valores
+    # devueltos por RETURNING ya están actualizados y no hace falta un refresh.
+    session.expunge(fila[0])
+    return (fila[0], *fila[1:], *anteriores)
+
+def _incrementar_version_rutina(session: Session, rutina_id: int) -> None:
+    """
+    Incrementa la versión de una rutina sin hacer commit. Se llama desde las escrituras
+    de ejercicios: forman parte del detalle de la rutina (RutinaRead) y, por lo tanto,
+    de su ETag.
+    """
+    session.exec(
+        update(Rutina)
+        .where(Rutina.id == rutina_id)
+        .values(version=Rutina.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def _marcar_caches_obsoletas(session: Session) -> None:
+    """
+    Incrementa la versión compartida de las cachés sin hacer commit: se confirma en
+    la misma transacción que la escritura, y los demás workers descartan sus cachés
+    en la siguiente lectura (ver `_sincronizar_caches`).
+    """
+    insertar = postgresql_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+    statement = insertar(VersionCache).values(nombre=VERSION_CACHES, version=1)
+    session.exec(statement.on_conflict_do_update(
+        index_elements=[VersionCache.nombre], set_={"version": VersionCache.version + 1}
+    ))
+
+def update_rutina(
+    session: Session, rutina_id: int, rutina_in: RutinaBase, version: Optional[int] = None
+) -> Optional[Rutina]:
     """
     Edita el nombre y la descripción de una rutina existente.
     Requisito: Editar el nombre y descripción.
+    Si se indica `version`, la modificación solo se aplica si coincide con la actual.
+    La unicidad del nombre la garantiza el índice único sobre lower(nombre).
     """
-    
-    # Si el nombre está en la entrada Y es diferente al actual, verificamos unicidad
-    if rutina_in.nombre and rutina_in.nombre != rutina.nombre:
-        if get_rutina_by_name(session, rutina_in.nombre):
-            raise RutinaNameTakenError(f"Ya existe otra rutina con el nombre '{rutina_in.nombre}'.")
-
-    # Copia solo los campos establecidos en rutina_in al objeto de DB
-    rutina.sqlmodel_update(rutina_in.model_dump(exclude_unset=True))
-    
-    session.add(rutina)
-    session.commit()
-    session.refresh(rutina)
+    datos = rutina_in.model_dump(exclude_unset=True)
+
+    try:
+        fila = _update_condicional(session, Rutina, rutina_id, version, datos)
+        if fila is not None:
+            _marcar_caches_obsoletas(session)
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise RutinaNameTakenError(f"Ya existe otra rutina con el nombre '{datos.get('nombre')}'.")
+    if fila is None:
+        return None
+    rutina = fila[0]
+    # El nombre de la rutina forma parte de las estadísticas por rutina
+    invalidar_estadisticas()
+    bus_eventos.publicar("rutina_actualizada", rutina_id=rutina.id)
     return rutina
 
 def update_ejercicio(
-    session: Session, ejercicio: Ejercicio, ejercicio_in: EjercicioBase
-) -> Ejercicio:
+    session: Session, ejercicio_id: int, ejercicio_in: EjercicioBase, version: Optional[int] = None
+) -> Optional[Ejercicio]:
     """
     Modifica los campos de un ejercicio existente.
     Requisito: Modificar ejercicios existentes (nombre, series, repeticiones, peso, notas, orden).
+    Si se indica `version`, la modificación solo se aplica si coincide con la actual.
     """
-    # Actualiza el ejercicio de DB con los datos de entrada
-    ejercicio.sqlmodel_update(ejercicio_in.model_dump(exclude_unset=True))
-    
-    session.add(ejercicio)
+    # El ejercicio no cambia de rutina
+    datos = ejercicio_in.model_dump(exclude_unset=True, exclude={"rutina_id"})
+
+    fila = _update_condicional(
+        session, Ejercicio, ejercicio_id, version, datos, (Ejercicio.dia_semana, Ejercicio.orden)
+    )
+    if fila is None:
+        return None
+    ejercicio, dia_anterior, orden_anterior = fila
+    _incrementar_version_rutina(session, ejercicio.rutina_id)
+    _marcar_caches_obsoletas(session)
     session.commit()
-    session.refresh(ejercicio)
+    invalidar_estadisticas()
+    invalidar_conteos(dia_anterior, ejercicio.dia_semana)
+    # Un cambio de día u orden se notifica como reordenamiento, con la nueva posición
+    if (dia_anterior, orden_anterior) != (ejercicio.dia_semana, ejercicio.orden):
+        bus_eventos.publicar(
+            "ejercicio_reordenado", rutina_id=ejercicio.rutina_id, ejercicio_id=ejercicio.id,
+            dia_semana=ejercicio.dia_semana.value, orden=ejercicio.orden
+        )
+    else:
+        bus_eventos.publicar("ejercicio_actualizado", rutina_id=ejercicio.rutina_id, ejercicio_id=ejercicio.id)
     return ejercicio
 
 def delete_ejercicio_by_id(session: Session, ejercicio_id: int) -> Optional[Ejercicio]:
@@ -158,9 +311,15 @@ def delete_ejercicio_by_id(session: Session, ejercicio_id: int) -> Optional[Ejer
     ejercicio = session.get(Ejercicio, ejercicio_id)
     if not ejercicio:
         return None
+    dia_semana, rutina_id = ejercicio.dia_semana, ejercicio.rutina_id
         
     session.delete(ejercicio)
+    _incrementar_version_rutina(session, rutina_id)
+    _marcar_caches_obsoletas(session)
     session.commit()
+    invalidar_estadisticas()
+    invalidar_conteos(dia_semana)
+    bus_eventos.publicar("ejercicio_eliminado", rutina_id=rutina_id, ejercicio_id=ejercicio_id)
     return ejercicio
 
 
@@ -205,6 +364,47 @@ def get_ejercicio_by_id(session: Session, ejercicio_id: int) -> Optional[Ejercic
 # --- Implmentación de paginación ---
 ModelType = TypeVar("ModelType", bound=SQLModel)
 
+# Las cachés son propias de cada proceso. Las escrituras, además de invalidar las
+# del proceso que escribe, incrementan la fila `VERSION_CACHES` de la tabla
+# versioncache; las lecturas cacheadas la consultan y, si avanzó, otro worker
+# escribió y se vacían las cachés locales.
+VERSION_CACHES = "rutinas"
+_version_caches_vista: Optional[int] = None
+
+def _sincronizar_caches(session: Session) -> None:
+    """Vacía las cachés locales si otro proceso escribió desde la última consulta."""
+    global _version_caches_vista
+    version = session.exec(
+        select(VersionCache.version).where(VersionCache.nombre == VERSION_CACHES)
+    ).one_or_none() or 0
+    # Solo avanza: una réplica retrasada puede devolver una versión anterior
+    if _version_caches_vista is None or version > _version_caches_vista:
+        _conteo_cache.clear()
+        _estadisticas_cache.clear()
+        _version_caches_vista = version
+
+# Caché del total de rutinas por filtro (None o cada DiaSemana). Evita repetir
+# el COUNT(*) en cada página de una misma navegación. Las funciones de escritura
+# la invalidan en todos los procesos (ver `_sincronizar_caches`); el TTL es un respaldo.
+CONTEO_CACHE_TTL_SEGUNDOS = 30
+_conteo_cache = TTLCache(ttl_segundos=CONTEO_CACHE_TTL_SEGUNDOS, max_entradas=len(DiaSemana) + 1)
+
+def _clave_conteo(dia_semana: Optional[str]) -> Optional[str]:
+    """Normaliza el filtro de día (Enum o str) a la clave de la caché de conteos."""
+    return DiaSemana(dia_semana).value if dia_semana else None
+
+def invalidar_conteos(*dias: Optional[str]) -> None:
+    """
+    Invalida los totales cacheados de la paginación.
+    Sin argumentos vacía la caché; con días concretos solo descarta esas claves
+    (`None` corresponde al listado sin filtro).
+    """
+    if not dias:
+        _conteo_cache.clear()
+        return
+    for dia in dias:
+        _conteo_cache.invalidate(_clave_conteo(dia))
+
 # Paginación y Filtros
 
 def get_rutinas_paginated(
@@ -229,9 +429,18 @@ def get_rutinas_paginated(
     else:
         statement = select(Rutina)
     
-    # Contar el total de elementos para la paginación
-    count_statement = select(func.count()).select_from(statement.subquery())
-    total_items = session.exec(count_statement).one()
+    # Contar el total de elementos para la paginación (cacheado por filtro)
+    clave_conteo = _clave_conteo(dia_semana_filtro)
+    _sincronizar_caches(session)
+    total_items = _conteo_cache.get(clave_conteo)
+    if total_items is None:
+        # Si una escritura invalida la caché durante el COUNT, el total ya no se guarda
+        generacion = _conteo_cache.generacion
+        count_statement = select(func.count()).select_from(statement.subquery())
+        total_items = session.exec(count_statement).one()
+        # Una réplica puede ir retrasada respecto a la escritura que invalidó la caché
+        if not es_sesion_replica(session):
+            _conteo_cache.set(clave_conteo, total_items, generacion)
     
     # Aplicar LIMIT y OFFSET
     results = session.exec(
@@ -252,28 +461,175 @@ def duplicate_rutina(session: Session, original_rutina_id: int) -> Optional[Ruti
         return None
     
     # Crear la nueva rutina con el nombre modificado
-    new_rutina_data = original.model_dump(exclude={"id", "fecha_creacion", "ejercicios"})
+    new_rutina_data = original.model_dump(exclude={"id", "fecha_creacion", "ejercicios", "version"})
     
+    nombre_original = original.nombre
+
     # Creamos un nombre único para la copia
     copy_count = 1
-    new_name = f"{original.nombre} (Copia {copy_count})"
-    while get_rutina_by_name(session, new_name):
+    while True:
+        new_name = f"{nombre_original} (Copia {copy_count})"
         copy_count += 1
-        new_name = f"{original.nombre} (Copia {copy_count})"
-
-    new_rutina_data['nombre'] = new_name
-    
-    new_rutina =Rutina(**new_rutina_data)
-    session.add(new_rutina)
-    session.flush()  # Flush para obtener el ID de la nueva rutina
+        if get_rutina_by_name(session, new_name):
+            continue
+
+        new_rutina_data['nombre'] = new_name
+        new_rutina = Rutina(**new_rutina_data)
+        session.add(new_rutina)
+        try:
+            session.flush()  # Flush para obtener el ID de la nueva rutina
+        except IntegrityError:
+            # Una duplicación concurrente tomó el mismo nombre: probamos con el siguiente
+            session.rollback()
+            continue
+        break
     
     # Duplicar los ejercicios asociados
     for original_ejercicio in original.ejercicios:
-        new_ejercicio_data = original_ejercicio.model_dump(exclude={"id", "rutina_id"})
+        new_ejercicio_data = original_ejercicio.model_dump(exclude={"id", "rutina_id", "version"})
         # Asignar la nueva rutina_id para mantener la relación
         new_ejercicio = Ejercicio(**new_ejercicio_data, rutina_id=new_rutina.id)
         session.add(new_ejercicio)
         
+    _marcar_caches_obsoletas(session)
     session.commit()
     session.refresh(new_rutina)
-    return new_rutina
\ No newline at end of file
+    invalidar_estadisticas()
+    invalidar_conteos()
+    bus_eventos.publicar("rutina_duplicada", rutina_id=new_rutina.id, origen_id=original_rutina_id)
+    return new_rutina
+
+# --- Estadísticas de Volumen de Entrenamiento ---
+
+# Caché de estadísticas indexada por filtro. Se invalida desde las funciones
+# de escritura de ejercicios (y de rutinas que los afectan), en todos los procesos.
+ESTADISTICAS_CACHE_TTL_SEGUNDOS = 300
+# Rutinas incluidas por defecto en el desglose `por_rutina`
+ESTADISTICAS_LIMITE_RUTINAS = 50
+_estadisticas_cache = TTLCache(ttl_segundos=ESTADISTICAS_CACHE_TTL_SEGUNDOS, max_entradas=256)
+
+def invalidar_estadisticas() -> None:
+    """Descarta las estadísticas cacheadas tras una modificación de ejercicios."""
+    _estadisticas_cache.clear()
+
+def _filtros_estadisticas(
+    rutina_id: Optional[int],
+    dia_semana: Optional[DiaSemana],
+    nombre_ejercicio: Optional[str]
+) -> list:
+    """Construye las condiciones WHERE comunes a todas las agregaciones."""
+    filtros = []
+    if rutina_id is not None:
+        filtros.append(Ejercicio.rutina_id == rutina_id)
+    if dia_semana:
+        filtros.append(Ejercicio.dia_semana == dia_semana)
+    if nombre_ejercicio:
+        # Búsqueda parcial e insensible a mayúsculas, igual que en la búsqueda de rutinas
+        filtros.append(func.lower(Ejercicio.nombre).like(f"%{nombre_ejercicio.lower()}%"))
+    return filtros
+
+def _columnas_volumen() -> tuple:
+    """Columnas agregadas (COUNT/SUM) que se calculan en la base de datos."""
+    repeticiones = Ejercicio.series * Ejercicio.repeticiones
+    return (
+        func.count(Ejercicio.id),
+        func.coalesce(func.sum(Ejercicio.series), 0),
+        func.coalesce(func.sum(repeticiones), 0),
+        # Los ejercicios de peso corporal (peso nulo) no suman tonelaje
+        func.coalesce(func.sum(repeticiones * func.coalesce(Ejercicio.peso, 0)), 0),
+    )
+
+def _volumen_desde_fila(total_ejercicios, total_series, total_repeticiones, tonelaje) -> dict:
+    """Convierte una fila agregada en los campos de `VolumenBase`."""
+    return {
+        "total_ejercicios": int(total_ejercicios),
+        "total_series": int(total_series),
+        "total_repeticiones": int(total_repeticiones),
+        "tonelaje": float(tonelaje),
+    }
+
+def get_estadisticas_volumen(
+    session: Session,
+    rutina_id: Optional[int] = None,
+    dia_semana: Optional[str] = None,
+    nombre_ejercicio: Optional[str] = None,
+    limite_rutinas: int = ESTADISTICAS_LIMITE_RUTINAS
+) -> EstadisticasRead:
+    """
+    Calcula el volumen de entrenamiento (series, repeticiones y tonelaje) total,
+    por rutina (las primeras `limite_rutinas` por ID) y por día, y el peso
+    máximo por nombre de ejercicio.
+    Toda la agregación se resuelve con GROUP BY en la base de datos. El resultado
+    se cachea por combinación de filtros, salvo las búsquedas por nombre: su
+    texto libre permitiría llenar la caché con combinaciones arbitrarias.
+    """
+    # DiaSemana es un Enum de str: normalizamos al valor para usarlo como clave
+    dia = DiaSemana(dia_semana) if dia_semana else None
+    cachear = not nombre_ejercicio
+    clave = (rutina_id, dia.value if dia else None, limite_rutinas)
+    if cachear:
+        _sincronizar_caches(session)
+        cacheado = _estadisticas_cache.get(clave)
+        if cacheado is not None:
+            return cacheado
+    generacion = _estadisticas_cache.generacion
+
+    filtros = _filtros_estadisticas(rutina_id, dia, nombre_ejercicio)
+    volumen = _columnas_volumen()
+
+    # Resumen global
+    resumen_fila = session.exec(select(*volumen).where(*filtros)).one()
+
+    # Volumen por rutina (JOIN para obtener el nombre)
+    por_rutina_statement = (
+        select(Rutina.id, Rutina.nombre, *volumen)
+        .join(Ejercicio, Ejercicio.rutina_id == Rutina.id)
+        .where(*filtros)
+        .group_by(Rutina.id, Rutina.nombre)
+        .order_by(Rutina.id)
+        .limit(limite_rutinas)
+    )
+    por_rutina = [
+        VolumenPorRutina(rutina_id=r_id, rutina_nombre=r_nombre, **_volumen_desde_fila(*fila))
+        for r_id, r_nombre, *fila in session.exec(por_rutina_statement).all()
+    ]
+    total_rutinas = session.exec(
+        select(func.count(func.distinct(Ejercicio.rutina_id))).where(*filtros)
+    ).one()
+
+    # Volumen por día de la semana
+    por_dia_statement = (
+        select(Ejercicio.dia_semana, *volumen)
+        .where(*filtros)
+        .group_by(Ejercicio.dia_semana)
+    )
+    por_dia = [
+        VolumenPorDia(dia_semana=dia, **_volumen_desde_fila(*fila))
+        for dia, *fila in session.exec(por_dia_statement).all()
+    ]
+    # Ordenamos según la semana (Lunes..Domingo) y no alfabéticamente
+    orden_dias = list(DiaSemana)
+    por_dia.sort(key=lambda v: orden_dias.index(v.dia_semana))
+
+    # Levantamiento más pesado por nombre de ejercicio
+    pesos_statement = (
+        select(Ejercicio.nombre, func.max(Ejercicio.peso))
+        .where(*filtros)
+        .group_by(Ejercicio.nombre)
+        .order_by(Ejercicio.nombre)
+    )
+    pesos_maximos = [
+        PesoMaximoEjercicio(nombre=nombre, peso_maximo=peso_maximo)
+        for nombre, peso_maximo in session.exec(pesos_statement).all()
+    ]
+
+    estadisticas = EstadisticasRead(
+        resumen=VolumenBase(**_volumen_desde_fila(*resumen_fila)),
+        total_rutinas=total_rutinas,
+        por_rutina=por_rutina,
+        por_dia=por_dia,
+        pesos_maximos=pesos_maximos,
+    )
+    if cachear and not es_sesion_replica(session):
+        _estadisticas_cache.set(clave, estadisticas, generacion)
+    return estadisticas
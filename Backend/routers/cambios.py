@@ -0,0 +1,71 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+
+from database import engine
+from eventos import bus_eventos
+from models import Usuario
+from security import decode_access_token
+
+# Definición del Router. Se establece el prefijo y las tags para la documentación (Swagger/Redoc).
+router = APIRouter(
+    prefix="/ws",
+    tags=["Cambios"]
+)
+
+# --- Autenticación del WebSocket ---
+
+def _usuario_de_token(token: Optional[str]) -> Optional[Usuario]:
+    """Valida el JWT (el mismo del login) y carga el usuario correspondiente."""
+    payload = decode_access_token(token) if token else None
+    user_id = payload.get("sub") if payload else None
+    if user_id is None:
+        return None
+    with Session(engine) as session:
+        return session.get(Usuario, int(user_id))
+
+# --- Feed de Cambios (/ws/rutinas) ---
+
+async def _enviar_eventos(websocket: WebSocket, suscripcion) -> None:
+    while True:
+        await websocket.send_json(await suscripcion.siguiente())
+
+async def _esperar_desconexion(websocket: WebSocket) -> None:
+    # El cliente no envía mensajes: solo leemos para detectar el cierre
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/rutinas")
+async def feed_cambios_rutinas(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None, description="Token JWT obtenido en /api/auth/login.")
+):
+    """
+    WS /ws/rutinas?token={jwt} - Notifica los cambios en rutinas y ejercicios
+    (creación, edición, borrado, duplicación y reordenamiento) como eventos JSON
+    compactos, p. ej. {"tipo": "rutina_creada", "rutina_id": 3}.
+    """
+    usuario = await run_in_threadpool(_usuario_de_token, token)
+    if usuario is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token inválido o expirado.")
+        return
+
+    await websocket.accept()
+    suscripcion = bus_eventos.suscribir()
+    tareas = [
+        asyncio.create_task(_enviar_eventos(websocket, suscripcion)),
+        asyncio.create_task(_esperar_desconexion(websocket)),
+    ]
+    try:
+        await asyncio.wait(tareas, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        bus_eventos.desuscribir(suscripcion)
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
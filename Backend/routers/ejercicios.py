@@ -1,11 +1,13 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
 from sqlmodel import Session
 
 from database import get_session
-from repository import get_rutina_detail_by_id, add_ejercicio_to_rutina, add_multiple_ejercicios_to_rutina, get_ejercicio_by_id, update_ejercicio, delete_ejercicio_by_id
-from models import Ejercicio, EjercicioBase, Usuario
+from repository import get_rutina_detail_by_id, add_ejercicio_to_rutina, add_multiple_ejercicios_to_rutina, update_ejercicio, delete_ejercicio_by_id, VersionConflictError
+from models import Ejercicio, EjercicioBase, TrabajoRead, Usuario
 from security import get_current_user
+from etags import agregar_etag, version_de_if_match
+from routers.trabajos import aceptar_trabajo
 
 # Definición del Router. Se establece el prefijo y las tags para la documentación (Swagger/Redoc).
 router = APIRouter(
@@ -31,10 +33,15 @@ def agregar_ejercicio_a_rutina(
         )
     return add_ejercicio_to_rutina(session, rutina_id, ejercicio_in)
 
-@router.post("/rutinas/{rutina_id}/ejercicios", response_model=List[Ejercicio])
+@router.post(
+    "/rutinas/{rutina_id}/ejercicios",
+    response_model=List[Ejercicio],
+    responses={status.HTTP_202_ACCEPTED: {"model": TrabajoRead, "description": "Alta masiva encolada (?async=true)."}}
+)
 def agregar_ejercicios_a_rutina(
     rutina_id: int,
     ejercicios_in: List[EjercicioBase],
+    asincrono: bool = Query(False, alias="async", description="Ejecutar en segundo plano y devolver 202 con el ID del trabajo."),
     session: Session = Depends(get_session),
     current_user: Usuario = Depends(get_current_user)
 ):
@@ -45,24 +52,43 @@ def agregar_ejercicios_a_rutina(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Rutina con ID {rutina_id} no encontrada. No se pueden agregar los ejercicios."
         )
+    if asincrono:
+        def agregar(job_session: Session, informar_progreso) -> list:
+            # La rutina pudo eliminarse entre la validación y la ejecución del trabajo
+            if not get_rutina_detail_by_id(job_session, rutina_id):
+                raise LookupError(f"Rutina con ID {rutina_id} no encontrada. No se pueden agregar los ejercicios.")
+            return [
+                ejercicio.model_dump(mode="json")
+                for ejercicio in add_multiple_ejercicios_to_rutina(job_session, rutina_id, ejercicios_in, informar_progreso)
+            ]
+
+        return aceptar_trabajo(session, "agregar_ejercicios", current_user, agregar)
     return add_multiple_ejercicios_to_rutina(session, rutina_id, ejercicios_in)
 
 @router.put("/ejercicios/{ejercicio_id}", response_model=Ejercicio)
 def actualizar_ejercicio_existente(
     ejercicio_id: int,
     ejercicio_in: EjercicioBase,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="Versión (ETag) esperada del ejercicio. Si no coincide se responde 409."),
     session: Session = Depends(get_session),
     current_user: Usuario = Depends(get_current_user)
 ):
     """PUT /api/ejercicios/{id} - Actualizar un ejercicio."""
-    ejercicio = get_ejercicio_by_id(session, ejercicio_id)
+    try:
+        ejercicio = update_ejercicio(session, ejercicio_id, ejercicio_in, version_de_if_match(if_match))
+    except VersionConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     if not ejercicio:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Ejercicio con ID {ejercicio_id} no encontrado."
         )
-    ejercicio_update_data = ejercicio_in.model_dump(exclude={"rutina_id"})
-    return update_ejercicio(session, ejercicio, EjercicioBase.model_validate(ejercicio_update_data))
+    agregar_etag(response, ejercicio.version)
+    return ejercicio
 
 
 @router.delete("/ejercicios/{ejercicio_id}", status_code=status.HTTP_204_NO_CONTENT)
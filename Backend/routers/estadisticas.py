@@ -0,0 +1,29 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from database import get_read_session
+from repository import get_estadisticas_volumen
+from models import DiaSemana, EstadisticasRead, Usuario
+from security import get_current_user
+
+# Definición del Router. Se establece el prefijo y las tags para la documentación (Swagger/Redoc).
+router = APIRouter(
+    prefix="/api",
+    tags=["Estadisticas"]
+)
+
+# --- Endpoints de Estadísticas (/api/estadisticas) ---
+
+@router.get("/estadisticas", response_model=EstadisticasRead)
+def obtener_estadisticas(
+    rutina_id: Optional[int] = Query(None, description="Limitar las estadísticas a una rutina."),
+    dia_semana: Optional[DiaSemana] = Query(None, description="Limitar las estadísticas a un día de la semana."),
+    nombre_ejercicio: Optional[str] = Query(None, description="Filtrar ejercicios por nombre (parcial e insensible a mayúsculas)."),
+    limite_rutinas: int = Query(50, ge=1, le=500, description="Rutinas incluidas en el desglose por rutina (por ID, máximo 500)."),
+    session: Session = Depends(get_read_session),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """GET /api/estadisticas - Volumen de entrenamiento (series, repeticiones, tonelaje) y pesos máximos."""
+    return get_estadisticas_volumen(session, rutina_id, dia_semana, nombre_ejercicio, limite_rutinas)
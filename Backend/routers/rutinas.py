@@ -1,12 +1,14 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
 from sqlmodel import Session
 
-from database import get_session
-from repository import duplicate_rutina, get_rutinas_paginated, search_rutinas_by_name, get_rutina_detail_by_id, create_rutina, update_rutina, delete_rutina_by_id, RutinaNameTakenError
-from models import DiaSemana, Rutina, RutinaBase, RutinaPaginatedRead, RutinaRead, Usuario, Usuario
+from database import get_read_session, get_session
+from repository import duplicate_rutina, get_rutinas_paginated, search_rutinas_by_name, get_rutina_detail_by_id, create_rutina, update_rutina, delete_rutina_by_id, RutinaNameTakenError, VersionConflictError
+from models import DiaSemana, Rutina, RutinaBase, RutinaPaginatedRead, RutinaRead, TrabajoRead, Usuario, Usuario
 from security import get_current_user
+from etags import agregar_etag, version_de_if_match
+from routers.trabajos import aceptar_trabajo
 
 # Definición del Router. Se establece el prefijo y las tags para la documentación (Swagger/Redoc).
 router = APIRouter(
@@ -21,7 +23,7 @@ def listar_todas_rutinas(
     pagina: int = Query(1, ge=1, description="Número de página a recuperar (mínimo 1)."),
     tamano_pagina: int = Query(10, ge=1, le=100, description="Tamaño de página (mínimo 1, máximo 100)."),
     dia_semana: Optional[DiaSemana] = Query(None, description="Filtrar rutinas por día de la semana."),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: Usuario = Depends(get_current_user)
     ):
     """GET /api/rutinas - Listar todas las rutinas con paginación y filtro opcional por día de la semana."""
@@ -45,7 +47,7 @@ def listar_todas_rutinas(
 @router.get("/rutinas/buscar", response_model=List[Rutina])
 def buscar_rutinas(
     nombre: str = Query(..., description="Texto a buscar en el nombre de la rutina (parcial e insensible a mayúsculas)."),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     current_user: Usuario = Depends(get_current_user)
 ):
     """GET /api/rutinas/buscar?nombre={texto} - Buscar rutinas por nombre."""
@@ -54,7 +56,8 @@ def buscar_rutinas(
 @router.get("/rutinas/{rutina_id}", response_model=RutinaRead)
 def obtener_detalle_rutina(
     rutina_id: int,
-    session: Session = Depends(get_session),
+    response: Response,
+    session: Session = Depends(get_read_session),
     current_user: Usuario = Depends(get_current_user)
     ):
     """GET /api/rutinas/{id} - Obtener detalle de una rutina específica con sus ejercicios."""
@@ -64,6 +67,7 @@ def obtener_detalle_rutina(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail=f"Rutina con ID {rutina_id} no encontrada."
         )
+    agregar_etag(response, rutina.version)
     return rutina
 
 @router.post("/rutinas", response_model=Rutina, status_code=status.HTTP_201_CREATED)
@@ -85,23 +89,26 @@ def crear_nueva_rutina(
 def actualizar_rutina_existente(
     rutina_id: int, 
     rutina_in: RutinaBase, 
+    response: Response,
+    if_match: Optional[str] = Header(None, description="Versión (ETag) esperada de la rutina. Si no coincide se responde 409."),
     session: Session = Depends(get_session),
     current_user: Usuario = Depends(get_current_user)
 ):
     """PUT /api/rutinas/{id} - Actualizar una rutina existente."""
-    rutina = get_rutina_detail_by_id(session, rutina_id)
-    if not rutina:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, 
-            detail=f"Rutina con ID {rutina_id} no encontrada."
-        )
     try:
-        return update_rutina(session, rutina, rutina_in)
-    except RutinaNameTakenError as e:
+        rutina = update_rutina(session, rutina_id, rutina_in, version_de_if_match(if_match))
+    except (RutinaNameTakenError, VersionConflictError) as e:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=str(e)
         )
+    if not rutina:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail=f"Rutina con ID {rutina_id} no encontrada."
+        )
+    agregar_etag(response, rutina.version)
+    return rutina
 
 @router.delete("/rutinas/{rutina_id}", status_code=status.HTTP_204_NO_CONTENT)
 def borrar_rutina_existente(
@@ -118,13 +125,34 @@ def borrar_rutina_existente(
         )
     return
 
-@router.post("/rutinas/{rutina_id}/duplicar", response_model=Rutina, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/rutinas/{rutina_id}/duplicar",
+    response_model=Rutina,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": TrabajoRead, "description": "Duplicación encolada (?async=true)."}}
+)
 def duplicar_rutina_existente(
     rutina_id: int,
+    asincrono: bool = Query(False, alias="async", description="Ejecutar en segundo plano y devolver 202 con el ID del trabajo."),
     session: Session = Depends(get_session),
     current_user: Usuario = Depends(get_current_user)
     ):
     """POST /api/rutinas/{id}/duplicar - Duplicar una rutina existente junto con sus ejercicios."""
+    if asincrono:
+        if not get_rutina_detail_by_id(session, rutina_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Rutina con ID {rutina_id} no encontrada. No se puede duplicar."
+            )
+        def duplicar(job_session: Session, informar_progreso) -> dict:
+            copia = duplicate_rutina(job_session, rutina_id)
+            if not copia:
+                # La rutina pudo eliminarse entre la validación y la ejecución del trabajo
+                raise LookupError(f"Rutina con ID {rutina_id} no encontrada. No se puede duplicar.")
+            return copia.model_dump(mode="json")
+
+        return aceptar_trabajo(session, "duplicar_rutina", current_user, duplicar)
+
     new_rutina = duplicate_rutina(session, rutina_id)
     if not new_rutina:
         raise HTTPException(
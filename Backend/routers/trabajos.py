@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlmodel import Session
+
+from database import get_session
+from cola_trabajos import ColaTrabajosLlenaError, FuncionTrabajo, encolar_trabajo, get_trabajo_by_id
+from models import Trabajo, TrabajoRead, Usuario
+from security import get_current_user
+
+# Definición del Router. Se establece el prefijo y las tags para la documentación (Swagger/Redoc).
+router = APIRouter(
+    prefix="/api",
+    tags=["Trabajos"]
+)
+
+# --- Utilidades para los Endpoints con Modo Asíncrono (?async=true) ---
+
+def aceptar_trabajo(session: Session, tipo: str, usuario: Usuario, funcion: FuncionTrabajo) -> JSONResponse:
+    """
+    Encola un trabajo y devuelve la respuesta 202 Accepted con su estado inicial
+    y la cabecera Location para consultar el progreso.
+    """
+    try:
+        trabajo = encolar_trabajo(session, tipo, usuario.id, funcion)
+    except ColaTrabajosLlenaError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"},
+        )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=TrabajoRead.model_validate(trabajo).model_dump(mode="json"),
+        headers={"Location": f"/api/jobs/{trabajo.id}"},
+    )
+
+# --- Endpoints de Trabajos (/api/jobs) ---
+
+@router.get("/jobs/{trabajo_id}", response_model=TrabajoRead)
+def obtener_trabajo(
+    trabajo_id: int,
+    session: Session = Depends(get_session),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """GET /api/jobs/{id} - Consultar el estado, progreso y resultado de un trabajo."""
+    trabajo = get_trabajo_by_id(session, trabajo_id)
+    # Cada usuario solo puede consultar sus propios trabajos
+    if not trabajo or trabajo.usuario_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Trabajo con ID {trabajo_id} no encontrado."
+        )
+    return trabajo
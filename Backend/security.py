@@ -8,7 +8,7 @@ from jose import jwt, JWTError
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session
 
-from database import get_session
+from database import engine, es_sesion_replica, get_read_session
 from models import Usuario
 
 # --- Configuración de Seguridad ---
@@ -60,7 +60,7 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
     
 def get_current_user(
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     token: str = Depends(oauth2_scheme)
     ) -> Usuario:
     """Dependecia de FastAPI para obtener el usuario actual a partir del token JWT."""
@@ -79,6 +79,10 @@ def get_current_user(
     
     # Obtener el usuario de la base de datos
     user = session.get(Usuario, int(user_id))
+    if user is None and es_sesion_replica(session):
+        # Un usuario recién registrado puede no haber llegado todavía a la réplica
+        with Session(engine) as primary_session:
+            user = primary_session.get(Usuario, int(user_id))
     
     if user is None:
         raise HTTPException(
@@ -0,0 +1,116 @@
+"""
+Punto de entrada de producción.
+
+Levanta la API con Gunicorn como gestor de procesos y workers de Uvicorn
+(uvloop + httptools). La aplicación se importa una sola vez en el proceso
+maestro (preload) y los workers se crean con fork, por lo que comparten el
+código ya cargado y arrancan más rápido.
+
+Por defecto se lanza un worker por CPU disponible. La idempotencia, el limitador
+de tasa y la invalidación de las cachés del repositorio se comparten entre
+workers; el feed de /ws/rutinas y la ventana de read-your-writes son por proceso.
+
+Uso (desde la carpeta Backend):
+    python server.py
+"""
+import os
+from os import getenv
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+# --- Configuración ---
+
+def cpus_disponibles() -> int:
+    """
+    CPUs que puede usar el proceso: respeta la afinidad y, dentro de un
+    contenedor, la cuota de CPU de cgroups v2 (cpu.max).
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as archivo:
+            cuota, periodo = archivo.read().split()
+        if cuota != "max":
+            cpus = min(cpus, max(1, int(int(cuota) / int(periodo))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+def calcular_workers() -> int:
+    """Workers indicados en WEB_CONCURRENCY; por defecto (o con 'auto') uno por CPU disponible."""
+    valor = getenv("WEB_CONCURRENCY", "auto").strip().lower()
+    return cpus_disponibles() if valor == "auto" else max(1, int(valor))
+
+class GymUvicornWorker(UvicornWorker):
+    """Worker de Uvicorn con uvloop y httptools explícitos (incluidos en fastapi[standard])."""
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+def opciones_servidor() -> dict:
+    """Opciones de Gunicorn, configurables por variables de entorno."""
+    return {
+        "bind": f"{getenv('HOST', '0.0.0.0')}:{getenv('PORT', '8000')}",
+        "workers": calcular_workers(),
+        "worker_class": GymUvicornWorker,
+        # Importar la app una sola vez antes del fork
+        "preload_app": True,
+        # Reiniciar cada worker tras N peticiones (con jitter para que no coincidan) acota el crecimiento de memoria
+        "max_requests": int(getenv("MAX_REQUESTS", "10000")),
+        "max_requests_jitter": int(getenv("MAX_REQUESTS_JITTER", "1000")),
+        # Segundos que un worker tiene para terminar sus peticiones y trabajos encolados
+        # al apagarse o reiniciarse; después recibe SIGKILL
+        "graceful_timeout": int(getenv("GRACEFUL_TIMEOUT", "120")),
+        "timeout": int(getenv("WORKER_TIMEOUT", "60")),
+        "keepalive": int(getenv("KEEPALIVE", "5")),
+        "post_fork": post_fork,
+        "accesslog": "-",
+    }
+
+# --- Hooks de Gunicorn ---
+
+def post_fork(server, worker) -> None:
+    """
+    Descarta en el worker las conexiones heredadas del maestro: un socket de
+    base de datos no puede compartirse entre procesos.
+    """
+    from database import descartar_conexiones_heredadas
+    descartar_conexiones_heredadas()
+
+# --- Aplicación ---
+
+class ServidorGunicorn(BaseApplication):
+    """Aplicación de Gunicorn que sirve la app de FastAPI ya importada."""
+
+    def __init__(self, application, opciones: dict):
+        self.application = application
+        self.opciones = opciones
+        super().__init__()
+
+    def load_config(self):
+        for clave, valor in self.opciones.items():
+            self.cfg.set(clave, valor)
+
+    def load(self):
+        return self.application
+
+def main() -> None:
+    # El limitador de tasa en memoria multiplicaría los límites por el número de
+    # workers: bajo server.py se comparte por defecto en un archivo SQLite local.
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "sqlite")
+
+    from database import create_db_and_tables, engine
+    from main import app
+
+    opciones = opciones_servidor()
+
+    # Inicialización única en el maestro, antes del fork: los workers no la repiten
+    create_db_and_tables()
+    # Cerramos las conexiones del maestro para que ningún worker las herede
+    engine.dispose()
+
+    ServidorGunicorn(app, opciones).run()
+
+if __name__ == "__main__":
+    main()